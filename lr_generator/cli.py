@@ -3,15 +3,19 @@ import click
 import yaml
 import os
 import time
+from functools import lru_cache
+import pandas as pd
+from contextlib import closing
 from pathlib import Path
+from typing import Optional
 from dotenv import load_dotenv
 from .watcher import start_watcher
 from .excel_reader import ExcelReader
 from .lr_generator import LRGenerator
 from .pdf_generator import PDFGenerator
 from .print_manager import PrintManager
-from .db import Database
-from typing import List, Dict
+from .db import Database, close_pool
+from .pipeline import BackgroundWriter, prefetch
 
 # Load environment variables
 load_dotenv()
@@ -24,11 +28,17 @@ def cli():
 def load_config():
     """Load configuration from rules.yml."""
     config_path = Path(__file__).parent.parent / 'rules.yml'
+    # Re-parse only when the file has changed since the last load
+    return _parse_config(str(config_path), config_path.stat().st_mtime_ns)
+
+@lru_cache(maxsize=1)
+def _parse_config(config_path: str, mtime_ns: int) -> dict:
+    """Parse the YAML config, using libyaml's C loader when it is available."""
     with open(config_path) as f:
-        return yaml.safe_load(f)
+        return yaml.load(f, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
 
-def get_db_connection():
-    """Get database connection from environment variables."""
+def get_db_connection(db_config: dict):
+    """Get a pooled database handle configured from environment variables."""
     return Database(
         connection_params={
             'host': os.getenv('DB_HOST', 'localhost'),
@@ -37,15 +47,26 @@ def get_db_connection():
             'user': os.getenv('DB_USER'),
             'password': os.getenv('DB_PASSWORD')
         },
-        table_name='lr_records'
+        table_name='lr_records',
+        min_connections=db_config.get('pool_min_connections', 2),
+        max_connections=db_config.get('pool_max_connections', 16)
     )
 
-def process_file(file_path: Path, config: dict, output_dir: Path, branch_code: str = "") -> bool:
-    """Process a single Excel file and return True if successful."""
+def process_file(file_path: Path, config: dict, output_dir: Path, branch_code: str = "",
+                 pdf_gen: Optional[PDFGenerator] = None) -> bool:
+    """Process a single Excel file and return True if successful.
+
+    pdf_gen may be a generator built once and shared between files; one is
+    built from config otherwise.
+    """
     from .monitoring import ProcessingCheckpoint, ProcessingMonitor, get_progress_bar
     
-    # Initialize monitoring and checkpointing
-    checkpoint = ProcessingCheckpoint(output_dir / ".checkpoints")
+    # Initialize monitoring and checkpointing; each file has its own
+    # checkpoint, as the watcher may process several files at once
+    checkpoint = ProcessingCheckpoint(
+        output_dir / ".checkpoints" / file_path.name,
+        sync_interval=config['processing'].get('checkpoint_sync_interval', 10)
+    )
     monitor = ProcessingMonitor()
     
     try:
@@ -64,10 +85,11 @@ def process_file(file_path: Path, config: dict, output_dir: Path, branch_code: s
             branch_code=branch_code
         )
         
-        pdf_gen = PDFGenerator(config['lr_generation'])
+        if pdf_gen is None:
+            pdf_gen = PDFGenerator(config['lr_generation'])
         
         # Initialize database
-        db = get_db_connection()
+        db = get_db_connection(config['database'])
         db.create_tables()
         
         # Initialize print manager if enabled
@@ -76,74 +98,100 @@ def process_file(file_path: Path, config: dict, output_dir: Path, branch_code: s
             print_manager = PrintManager(
                 printer_name=config['print_settings']['printer_name'],
                 copies=config['print_settings']['copies'],
-                timeout_seconds=config['print_settings']['timeout_seconds']
+                timeout_seconds=config['print_settings']['timeout_seconds'],
+                sumatra_path=config['print_settings'].get('sumatra_path')
             )
         
-        # Get total rows for progress tracking
-        total_rows = reader.get_total_rows(file_path)
-        progress = monitor.start_processing(str(file_path), total_rows)
-        
-        # Process Excel file in chunks
-        valid_records = []
-        total_errors = 0
-        current_batch = []
-        processed_rows = start_row
-        
-        with progress:
-            task = progress.add_task("Processing records...", total=total_rows)
+        # Open the workbook once for both counting and reading
+        with reader.open(file_path):
+            # Size the progress bar from the sheet dimension instead of a counting
+            # pass; without one the bar is indeterminate
+            total_rows = reader.estimated_rows(file_path)
+            progress = monitor.start_processing(str(file_path), total_rows)
             
-            # Read and process Excel file in chunks
-            for record in reader.read_excel(file_path, start_row=start_row):
-                errors = reader.validate_record(record)
-                if not errors:
-                    record['lr_id'] = lr_gen.generate_lr_id(record)
-                    current_batch.append(record)
-                    valid_records.append(record)
-                    
-                    # Process batch if it reaches the batch size
-                    if len(current_batch) >= config['processing']['db_batch_size']:
-                        _process_batch(current_batch, db, config)
-                        current_batch = []
-                else:
-                    total_errors += 1
-                    click.echo(f"Validation errors for record: {errors}")
+            # Process Excel file in chunks, laying out LRs as they are validated
+            document = pdf_gen.open_document()
+            valid_count = 0
+            total_errors = 0
+            # Validation errors go to a per-file report instead of one echo per row
+            errors_path = output_dir / f"errors_{file_path.stem}.log"
+            errors_log = None
+            processed_rows = start_row
+            resume_row = start_row
+            db_batch_size = config['processing']['db_batch_size']
+            checkpoint_interval = config['processing']['checkpoint_interval']
+            queue_size = config['processing'].get('pipeline_queue_size', 8)
+            
+            # Batches share one transaction, committed at each checkpoint and at the end
+            db.begin()
+            
+            # Parsing, validation and database writes run as overlapping stages:
+            # a reader thread parses ahead while this thread validates, and a
+            # writer thread stores batches and saves checkpoints in order
+            with progress, BackgroundWriter(queue_size) as writer, \
+                    closing(prefetch(reader.read_chunks(file_path, start_row=start_row), queue_size)) as chunks:
+                task = progress.add_task("Processing records...", total=total_rows)
                 
-                processed_rows += 1
-                progress.update(task, advance=1)
+                # Validate and enrich each chunk as a whole instead of row by row
+                for chunk in chunks:
+                    valid_mask, chunk_errors = reader.validate_chunk(chunk)
+                    valid_chunk = chunk[valid_mask].copy()
+                    if not valid_chunk.empty:
+                        valid_chunk['lr_id'] = lr_gen.generate_lr_ids(len(valid_chunk))
+                        for i in range(0, len(valid_chunk), db_batch_size):
+                            writer.submit(_process_batch, valid_chunk.iloc[i:i + db_batch_size], db, config)
+                        document.add_records(valid_chunk)
+                        valid_count += len(valid_chunk)
+                    
+                    if chunk_errors:
+                        total_errors += len(chunk_errors)
+                        if errors_log is None:
+                            errors_log = open(errors_path, 'w', buffering=1 << 16)
+                        # Sheet row number: data rows start below the header
+                        errors_log.writelines(
+                            f"Row {row_idx + 2}: {row_errors}\n" for row_idx, row_errors in chunk_errors.items()
+                        )
+                    
+                    previous_rows = processed_rows
+                    processed_rows += len(chunk)
+                    # Chunks skip blank rows, so resume from the sheet position instead.
+                    # Progress also counts sheet positions to match the estimate.
+                    progress.update(task, advance=int(chunk.index[-1]) + 1 - resume_row)
+                    resume_row = int(chunk.index[-1]) + 1
+                    
+                    if total_errors and processed_rows // 10000 > previous_rows // 10000:
+                        click.echo(f"{total_errors} validation errors so far")
+                    
+                    # Save checkpoint whenever another interval boundary is crossed.
+                    # Queued behind the batches above so it only records stored rows.
+                    if processed_rows // checkpoint_interval > previous_rows // checkpoint_interval:
+                        writer.submit(
+                            _save_checkpoint,
+                            db,
+                            checkpoint,
+                            str(file_path),
+                            resume_row,
+                            valid_count,
+                            total_errors
+                        )
                 
-                # Save checkpoint periodically
-                if processed_rows % config['processing']['checkpoint_interval'] == 0:
-                    checkpoint.save_progress(
-                        str(file_path),
-                        processed_rows,
-                        {
-                            'valid_records': len(valid_records),
-                            'total_errors': total_errors
-                        }
-                    )
-        
-        # Process remaining records in the last batch
-        if current_batch:
-            _process_batch(current_batch, db, config)
+                # The dimension may overstate the used range
+                if total_rows is not None:
+                    progress.update(task, completed=total_rows)
+            
+            db.commit()
+            
+            if errors_log is not None:
+                errors_log.close()
+                click.echo(f"{total_errors} records failed validation, see {errors_path}")
         
-        if not valid_records:
+        if not valid_count:
             click.echo("No valid records found")
             return False
         
-        # Generate PDF with progress bar
-        with get_progress_bar(len(valid_records), "Generating PDF") as progress:
-            task = progress.add_task("Generating...", total=len(valid_records))
-            
-            output_path = output_dir / f"lr_batch_{branch_code}_{len(valid_records)}.pdf"
-            batch_size = config['processing']['pdf_batch_size']
-            
-            for i in range(0, len(valid_records), batch_size):
-                batch_records = valid_records[i:i + batch_size]
-                if i == 0:
-                    pdf_gen.create_lr_document(batch_records, str(output_path))
-                else:
-                    pdf_gen.append_to_document(batch_records, str(output_path))
-                progress.update(task, advance=len(batch_records))
+        # Every LR is already laid out; only the file has to be written
+        output_path = output_dir / f"lr_batch_{branch_code}_{valid_count}.pdf"
+        document.save(str(output_path))
         
         click.echo(f"Generated PDF: {output_path}")
         
@@ -160,7 +208,7 @@ def process_file(file_path: Path, config: dict, output_dir: Path, branch_code: s
         # Log completion
         monitor.end_processing(
             total_processed=processed_rows,
-            total_valid=len(valid_records),
+            total_valid=valid_count,
             total_errors=total_errors
         )
         
@@ -172,17 +220,28 @@ def process_file(file_path: Path, config: dict, output_dir: Path, branch_code: s
         click.echo(f"Error processing file: {str(e)}", err=True)
         return False
     finally:
+        if locals().get('errors_log') is not None:
+            errors_log.close()
+        checkpoint.close()
+        # Hands the connection back to the shared pool for the next file
         if 'db' in locals():
             db.close()
 
-def _process_batch(batch: List[Dict], db: Database, config: dict):
+def _save_checkpoint(db: Database, checkpoint, file: str, last_row: int,
+                     valid_count: int, error_count: int):
+    """Commit the rows stored so far, then record them in the checkpoint."""
+    db.commit()
+    db.begin()
+    checkpoint.save_progress(file, last_row, valid_count, error_count)
+
+def _process_batch(batch: pd.DataFrame, db: Database, config: dict):
     """Process a batch of records with retry logic."""
     max_attempts = config['database'].get('retry_attempts', 3)
     retry_delay = config['database'].get('retry_delay_seconds', 5)
     
     for attempt in range(max_attempts):
         try:
-            db.insert_records(batch, config['database']['batch_size'])
+            db.copy_records(batch)
             click.echo(f"Stored {len(batch)} records in database")
             break
         except Exception as e:
@@ -200,18 +259,25 @@ def watch(watch_dir, output_dir, branch_code):
     config = load_config()
     watch_settings = config['watch_settings']
     
+    # The LR layout depends only on the configuration, so it is built once
+    # for every file the watcher picks up
+    pdf_gen = PDFGenerator(config['lr_generation'])
+
     # Create process_callback
     def callback(file_path: Path) -> bool:
-        return process_file(file_path, config, Path(output_dir), branch_code)
+        return process_file(file_path, config, Path(output_dir), branch_code, pdf_gen=pdf_gen)
     
     click.echo(f"Starting watcher for directory: {watch_dir}")
-    observer = start_watcher(
+    observer, handler = start_watcher(
         watch_dir,
         patterns=watch_settings['patterns'],
         ignore_patterns=watch_settings['ignore_patterns'],
         process_callback=callback,
         stabilization_seconds=watch_settings['stabilization_seconds'],
-        delete_after_processing=watch_settings['delete_after_processing']
+        delete_after_processing=watch_settings['delete_after_processing'],
+        max_workers=config['processing'].get('max_workers', 4),
+        processed_dir=watch_settings.get('processed_dir'),
+        use_polling=watch_settings.get('use_polling', False)
     )
     
     try:
@@ -219,6 +285,11 @@ def watch(watch_dir, output_dir, branch_code):
     except KeyboardInterrupt:
         observer.stop()
         observer.join()
+    finally:
+        # Let files already being processed finish before their database
+        # connections are closed
+        handler.shutdown(wait=True)
+        close_pool()
 
 @cli.command()
 @click.argument('input_file', type=click.Path(exists=True))
@@ -227,7 +298,10 @@ def watch(watch_dir, output_dir, branch_code):
 def process(input_file, output_dir, branch_code):
     """Process a single Excel file."""
     config = load_config()
-    success = process_file(Path(input_file), config, Path(output_dir), branch_code)
+    try:
+        success = process_file(Path(input_file), config, Path(output_dir), branch_code)
+    finally:
+        close_pool()
     if not success:
         click.echo("Failed to process file")
 
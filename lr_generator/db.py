@@ -1,24 +1,231 @@
 """Database operations module."""
+import io
+import struct
+import threading
+from contextlib import contextmanager
 import psycopg2
-from typing import List, Dict
-from psycopg2.extras import execute_batch
-from datetime import date, time
+from typing import Iterable, List, Dict, Optional, Set, Tuple, Union
+from psycopg2.pool import ThreadedConnectionPool
+from datetime import date
+from decimal import Decimal
+from operator import itemgetter
 import pandas as pd
 
+# Columns written for every record, in insert order
+RECORD_COLUMNS = (
+    'lr_id', 'invoice_number', 'receive_date', 'time', 'brand', 'party_name',
+    'location', 'boxes', 'transporter', 'transit_time', 'eway_bill', 'pin_code',
+    'amount', 'weight', 'lr_no', 'remark', 'status', 'delivery_date',
+)
+# PostgreSQL type of each column, matching create_tables
+_COLUMN_TYPES = {
+    'lr_id': 'varchar', 'invoice_number': 'varchar', 'receive_date': 'date',
+    'time': 'time', 'brand': 'varchar', 'party_name': 'varchar',
+    'location': 'varchar', 'boxes': 'integer', 'transporter': 'varchar',
+    'transit_time': 'date', 'eway_bill': 'varchar', 'pin_code': 'integer',
+    'amount': 'numeric', 'weight': 'varchar', 'lr_no': 'varchar',
+    'remark': 'text', 'status': 'varchar', 'delivery_date': 'date',
+}
+_TEXT_COLUMNS = [col for col in RECORD_COLUMNS if _COLUMN_TYPES[col] in ('varchar', 'text')]
+_COLUMN_LIST = ', '.join(RECORD_COLUMNS)
+# Everything except the keys is refreshed when an invoice is re-imported
+_UPSERT_SET = ', '.join(f"{col} = EXCLUDED.{col}" for col in RECORD_COLUMNS[2:])
+
+def _clean_text(value):
+    # value != value is only true for NaN and NaT
+    if value is None or value != value or value == '':
+        return None
+    return str(value)
+
+def _clean_other(value):
+    if value is None or value != value or value == '':
+        return None
+    return value
+
+# Cleaner for each column, chosen once from its PostgreSQL type
+_COLUMN_CLEANERS = [_clean_text if col in _TEXT_COLUMNS else _clean_other for col in RECORD_COLUMNS]
+# Pulls every column out of a record dict in one C-level call
+_RECORD_GETTER = itemgetter(*RECORD_COLUMNS)
+_EMPTY_RECORD = dict.fromkeys(RECORD_COLUMNS)
+
+# Binary COPY framing: signature, flags and header extension length
+_COPY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('>ii', 0, 0)
+_COPY_TRAILER = struct.pack('>h', -1)
+_COPY_NULL = struct.pack('>i', -1)
+_COPY_ROW = struct.pack('>h', len(RECORD_COLUMNS))
+_PG_EPOCH = date(2000, 1, 1).toordinal()
+
+def _encode_text(value) -> bytes:
+    return value.encode('utf-8')
+
+def _encode_integer(value) -> bytes:
+    return struct.pack('>i', int(value))
+
+def _encode_date(value) -> bytes:
+    # Days since 2000-01-01
+    return struct.pack('>i', value.toordinal() - _PG_EPOCH)
+
+def _encode_time(value) -> bytes:
+    # Microseconds since midnight
+    micros = ((value.hour * 60 + value.minute) * 60 + value.second) * 1000000 + value.microsecond
+    return struct.pack('>q', micros)
+
+def _encode_numeric(value) -> bytes:
+    """Encode a number as PostgreSQL NUMERIC: base-10000 digits plus weight, sign and scale."""
+    number = value if isinstance(value, Decimal) else Decimal(str(value))
+    if not number.is_finite():
+        # NaN never gets here (it is cleaned to NULL); infinity has no place
+        # in an amount, so refuse it rather than store it as NaN
+        raise ValueError(f"Cannot store non-finite number {value!r} as NUMERIC")
+    sign, digits, exponent = number.as_tuple()
+    digits = ''.join(map(str, digits))
+    scale = max(0, -exponent)
+    if exponent > 0:
+        digits += '0' * exponent
+        exponent = 0
+    digits = digits.rjust(scale + 1, '0')
+    whole, fraction = digits[:len(digits) - scale], digits[len(digits) - scale:]
+
+    # Group the digits in fours outwards from the decimal point
+    whole = whole.rjust(-(-len(whole) // 4) * 4, '0')
+    fraction = fraction.ljust(-(-len(fraction) // 4) * 4, '0')
+    groups = [int(whole[i:i + 4]) for i in range(0, len(whole), 4)]
+    weight = len(groups) - 1
+    groups += [int(fraction[i:i + 4]) for i in range(0, len(fraction), 4)]
+    while groups and groups[0] == 0:
+        groups.pop(0)
+        weight -= 1
+    while groups and groups[-1] == 0:
+        groups.pop()
+    if not groups:
+        weight = 0
+
+    return struct.pack(f'>hhHH{len(groups)}H', len(groups), weight,
+                       0x4000 if sign else 0, scale, *groups)
+
+_ENCODERS = {
+    'varchar': _encode_text, 'text': _encode_text, 'integer': _encode_integer,
+    'date': _encode_date, 'time': _encode_time, 'numeric': _encode_numeric,
+}
+_COLUMN_ENCODERS = [_ENCODERS[_COLUMN_TYPES[col]] for col in RECORD_COLUMNS]
+
+def _binary_copy_data(rows: Iterable[tuple]) -> io.BytesIO:
+    """Serialise rows in RECORD_COLUMNS order to COPY's binary format."""
+    buf = io.BytesIO()
+    write = buf.write
+    write(_COPY_HEADER)
+    for row in rows:
+        write(_COPY_ROW)
+        for encode, value in zip(_COLUMN_ENCODERS, row):
+            if value is None:
+                write(_COPY_NULL)
+            else:
+                data = encode(value)
+                write(struct.pack('>i', len(data)))
+                write(data)
+    write(_COPY_TRAILER)
+    buf.seek(0)
+    return buf
+
+# Connections are shared by every Database instance in the process so that
+# the watcher does not pay a new connect/auth handshake for each file
+_POOL: Optional[ThreadedConnectionPool] = None
+_POOL_LOCK = threading.Lock()
+
+def init_pool(connection_params: Dict[str, str], min_connections: int = 2,
+              max_connections: int = 16) -> ThreadedConnectionPool:
+    """Create the shared connection pool on first use and return it."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None or _POOL.closed:
+            _POOL = ThreadedConnectionPool(min_connections, max_connections, **connection_params)
+        return _POOL
+
+def close_pool():
+    """Close every connection held by the shared pool."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.closeall()
+            _POOL = None
+
 class Database:
-    def __init__(self, connection_params: Dict[str, str], table_name: str):
+    # Tables already created by this process, keyed by server, database and table
+    _tables_created: Set[Tuple] = set()
+
+    def __init__(self, connection_params: Dict[str, str], table_name: str,
+                 min_connections: int = 2, max_connections: int = 16):
         self.connection_params = connection_params
         self.table_name = table_name
+        self.min_connections = min_connections
+        self.max_connections = max_connections
+        self._pool = None
         self._connection = None
+        self._in_transaction = False
 
     def connect(self):
-        """Establish database connection."""
-        if not self._connection or self._connection.closed:
-            self._connection = psycopg2.connect(**self.connection_params)
+        """Borrow a connection from the shared pool."""
+        if self._connection is not None and self._connection.closed:
+            if self._in_transaction:
+                raise psycopg2.InterfaceError("connection lost during transaction")
+            # Hand the dead connection back so the pool can discard it
+            self.close()
+        if self._connection is None:
+            self._pool = init_pool(self.connection_params, self.min_connections, self.max_connections)
+            self._connection = self._pool.getconn()
         return self._connection
 
+    def begin(self):
+        """Group the following writes into one transaction until commit() or rollback()."""
+        self.connect()
+        self._in_transaction = True
+
+    def commit(self):
+        """Commit the writes made since begin()."""
+        if self._connection is not None:
+            self._connection.commit()
+        self._in_transaction = False
+
+    def rollback(self):
+        """Discard the writes made since begin()."""
+        if self._connection is not None and not self._connection.closed:
+            self._connection.rollback()
+        self._in_transaction = False
+
+    @contextmanager
+    def _write(self):
+        """Yield a cursor for one write.
+
+        Outside begin()/commit() each write is committed on its own. Inside
+        one it runs under a savepoint, so a failed write can be retried
+        without losing the rest of the transaction.
+        """
+        conn = self.connect()
+        if not self._in_transaction:
+            with conn:
+                with conn.cursor() as cur:
+                    yield cur
+            return
+
+        with conn.cursor() as cur:
+            cur.execute("SAVEPOINT lr_write")
+            try:
+                yield cur
+            except Exception:
+                cur.execute("ROLLBACK TO SAVEPOINT lr_write")
+                raise
+            cur.execute("RELEASE SAVEPOINT lr_write")
+
     def create_tables(self):
         """Create necessary database tables if they don't exist."""
+        # Only the first call per process needs the round trip
+        key = (
+            self.connection_params.get('host'), self.connection_params.get('port'),
+            self.connection_params.get('database'), self.table_name
+        )
+        if key in Database._tables_created:
+            return
+
         with self.connect() as conn:
             with conn.cursor() as cur:
                 cur.execute(f"""
@@ -46,73 +253,83 @@ class Database:
                     )
                 """)
                 conn.commit()
+        Database._tables_created.add(key)
 
-    def _clean_value(self, value):
-        """Clean value for database insertion."""
-        if pd.isna(value) or value == '':
-            return None
-        if isinstance(value, (date, time)):
-            return value
-        return str(value)
+    def _record_values(self, records: Union[List[Dict], pd.DataFrame]) -> List[tuple]:
+        """Convert records to parameter tuples in RECORD_COLUMNS order.
 
-    def insert_records(self, records: List[Dict], batch_size: int = 100):
-        """Insert multiple records into the database."""
-        with self.connect() as conn:
-            with conn.cursor() as cur:
-                query = f"""
-                    INSERT INTO {self.table_name}
-                    (lr_id, invoice_number, receive_date, time, brand, party_name,
-                     location, boxes, transporter, transit_time, eway_bill, pin_code,
-                     amount, weight, lr_no, remark, status, delivery_date)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (invoice_number) DO UPDATE SET
-                    receive_date = EXCLUDED.receive_date,
-                    time = EXCLUDED.time,
-                    brand = EXCLUDED.brand,
-                    party_name = EXCLUDED.party_name,
-                    location = EXCLUDED.location,
-                    boxes = EXCLUDED.boxes,
-                    transporter = EXCLUDED.transporter,
-                    transit_time = EXCLUDED.transit_time,
-                    eway_bill = EXCLUDED.eway_bill,
-                    pin_code = EXCLUDED.pin_code,
-                    amount = EXCLUDED.amount,
-                    weight = EXCLUDED.weight,
-                    lr_no = EXCLUDED.lr_no,
-                    remark = EXCLUDED.remark,
-                    status = EXCLUDED.status,
-                    delivery_date = EXCLUDED.delivery_date
-                """
-                
-                values = [
-                    (
-                        self._clean_value(record['lr_id']),
-                        self._clean_value(record['invoice_number']),
-                        self._clean_value(record['receive_date']),
-                        self._clean_value(record.get('time')),
-                        self._clean_value(record.get('brand')),
-                        self._clean_value(record['party_name']),
-                        self._clean_value(record['location']),
-                        self._clean_value(record['boxes']),
-                        self._clean_value(record['transporter']),
-                        self._clean_value(record.get('transit_time')),
-                        self._clean_value(record.get('eway_bill')),
-                        self._clean_value(record.get('pin_code')),
-                        self._clean_value(record.get('amount')),
-                        self._clean_value(record['weight']),
-                        self._clean_value(record.get('lr_no')),
-                        self._clean_value(record.get('remark')),
-                        self._clean_value(record.get('status')),
-                        self._clean_value(record.get('delivery_date'))
-                    )
-                    for record in records
-                ]
-                
-                execute_batch(cur, query, values, page_size=batch_size)
-                conn.commit()
+        Nulls are normalised once for the whole batch: NaN/NaT and empty
+        strings become None. Only text columns are coerced with str();
+        dates, times and numbers keep their Python types.
+        """
+        if not isinstance(records, pd.DataFrame):
+            # Plain dicts skip pandas and use each column's cleaner directly
+            try:
+                rows = list(map(_RECORD_GETTER, records))
+            except KeyError:
+                # Some records omit optional columns
+                rows = [_RECORD_GETTER({**_EMPTY_RECORD, **record}) for record in records]
+            return [
+                tuple([clean(value) for clean, value in zip(_COLUMN_CLEANERS, row)])
+                for row in rows
+            ]
+
+        df = records.reindex(columns=list(RECORD_COLUMNS))
+        df[_TEXT_COLUMNS] = df[_TEXT_COLUMNS].apply(lambda col: col.map(str, na_action='ignore'))
+        df = df.astype(object)
+        df = df.where(df.notna(), None).replace({'': None})
+        return list(df.itertuples(index=False, name=None))
+
+    def copy_records(self, records: Union[List[Dict], pd.DataFrame]):
+        """Bulk insert records with COPY, updating rows whose invoice already exists.
+
+        records may be dicts or a DataFrame.
+        """
+        rows = self._record_values(records)
+
+        with self._write() as cur:
+            self._copy_records(cur, rows)
+
+    def _copy_records(self, cur, rows: Iterable[tuple]):
+        """Stream rows into a staging table with binary COPY and upsert them.
+
+        Values travel in PostgreSQL's own binary representation, so dates,
+        times and numbers are neither formatted here nor parsed by the server.
+
+        COPY has no ON CONFLICT clause, so the rows land in a temporary table
+        first and are merged into the target with a single INSERT ... SELECT.
+        The staging table lives for the whole session and is emptied after
+        each merge, so repeated batches do not create and drop catalog entries.
+        """
+        staging = f"tmp_{self.table_name}"
+        cur.execute(f"""
+            CREATE TEMP TABLE IF NOT EXISTS {staging}
+            (LIKE {self.table_name} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS
+        """)
+        cur.copy_expert(
+            f"COPY {staging} ({_COLUMN_LIST}) FROM STDIN WITH (FORMAT BINARY)",
+            _binary_copy_data(rows)
+        )
+        # One statement may not upsert the same row twice, so keep only the
+        # last occurrence of a repeated invoice as row-by-row inserts would.
+        # Merge and cleanup share a round trip.
+        cur.execute(f"""
+            INSERT INTO {self.table_name} ({_COLUMN_LIST})
+            SELECT DISTINCT ON (invoice_number) {_COLUMN_LIST}
+            FROM {staging}
+            ORDER BY invoice_number, ctid DESC
+            ON CONFLICT (invoice_number) DO UPDATE SET {_UPSERT_SET};
+            TRUNCATE {staging}
+        """)
 
     def close(self):
-        """Close the database connection."""
+        """Return the connection to the shared pool, discarding any open transaction."""
+        if self._in_transaction:
+            self.rollback()
         if self._connection:
-            self._connection.close()
+            if self._pool.closed:
+                self._connection.close()
+            else:
+                self._pool.putconn(self._connection)
             self._connection = None
+            self._pool = None
@@ -1,11 +1,81 @@
 """Excel file reader and preprocessor module."""
-from typing import Dict, List, Generator, Iterator, Optional, Set
+import re
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import islice
+from typing import Dict, List, Iterable, Iterator, Optional, Set, Tuple
+import numpy as np
 import pandas as pd
+from openpyxl import load_workbook
 from pathlib import Path
 import structlog
 
 logger = structlog.get_logger()
 
+_INT32_MAX = 2**31 - 1
+
+def _to_date(values: pd.Series) -> pd.Series:
+    if values.dtype.kind == 'M':
+        # Date cells, already converted by openpyxl
+        return values.dt.date
+    # Fast path for the sheet's usual format; repeated dates are parsed once
+    parsed = pd.to_datetime(values, format='%d-%B-%Y', errors='coerce', cache=True)
+    # Only values that did not match are parsed again, each by inference
+    leftover = parsed.isna() & values.notna()
+    if leftover.any():
+        parsed[leftover] = pd.to_datetime(values[leftover], format='mixed', errors='coerce', cache=True)
+    return parsed.dt.date
+
+def _to_time(values: pd.Series) -> pd.Series:
+    if values.dtype.kind == 'M':
+        return values.dt.time
+    # Handle various time formats
+    return pd.to_datetime(values, format='mixed', errors='coerce').dt.time
+
+def _to_int(values: pd.Series) -> pd.Series:
+    # Stored as PostgreSQL INTEGER, so 32 bits is enough; values outside that
+    # range are treated like unparseable ones instead of wrapping around
+    if values.dtype.kind in 'iu':
+        # Whole column of numeric cells; only the range needs checking
+        return values.where(values.abs() <= _INT32_MAX, 0).astype('int32')
+    numbers = values if values.dtype.kind == 'f' else pd.to_numeric(values, errors='coerce')
+    numbers = numbers.where(numbers.abs() <= _INT32_MAX)
+    return numbers.fillna(0).astype('int32')
+
+def _to_float(values: pd.Series) -> pd.Series:
+    # Kept at float64: amounts need more than float32's ~7 significant digits
+    if values.dtype.kind == 'f':
+        return values.fillna(0.0)
+    if values.dtype.kind in 'iu':
+        return values.astype('float64')
+    return pd.to_numeric(values, errors='coerce').fillna(0.0)
+
+def _to_str(values: pd.Series) -> pd.Series:
+    # One pass over the cells instead of separate fillna, astype and strip passes
+    return pd.Series(
+        [v.strip() if isinstance(v, str) else '' if v is None or v != v else str(v).strip()
+         for v in values.tolist()],
+        index=values.index, dtype=str,
+    )
+
+# Vectorised converter for each field type in validation_rules.field_types
+_CONVERTERS = {
+    'date': _to_date,
+    'time': _to_time,
+    'int': _to_int,
+    'float': _to_float,
+    'str': _to_str,
+}
+
+# Column value used when a whole column fails to convert
+_CONVERSION_DEFAULTS = {
+    'date': None,
+    'time': None,
+    'int': 0,
+    'float': 0.0,
+    'str': '',
+}
+
 class ExcelReader:
     def __init__(self, config: dict, chunk_size: int = 1000):
         """Initialize ExcelReader with configuration.
@@ -18,26 +88,50 @@ class ExcelReader:
         self.field_types = config['field_types']
         self.required_fields = config['pdf_fields']
         self.chunk_size = chunk_size
+        # Conversion for each typed field, resolved once rather than per chunk
+        self._converters = [
+            (field, field_type, _CONVERTERS[field_type])
+            for field, field_type in self.field_types.items()
+            if field_type in _CONVERTERS
+        ]
+        # Amounts that overflow to infinity parse cleanly but cannot be stored
+        self._float_fields = [field for field, field_type in self.field_types.items() if field_type == 'float']
+        # Optional per-field formats, compiled once for every chunk and record
+        self.field_patterns = {
+            field: re.compile(pattern)
+            for field, pattern in (config.get('field_patterns') or {}).items()
+        }
+        self._workbook = None
+        self._workbook_path: Optional[Path] = None
         
         # Create reverse mapping for column name variations
         self.column_variations = {}
         for excel_col, db_field in self.column_mapping.items():
             normalized = self._normalize_column_name(excel_col)
             self.column_variations[normalized] = db_field
+        # Normalized Excel headers that must be present in every sheet
+        self._required_normalized = frozenset(
+            self._normalize_column_name(col)
+            for col, db_field in self.column_mapping.items()
+            if db_field in self.required_fields
+        )
 
-    def _normalize_column_name(self, column: str) -> str:
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _normalize_column_name(column: str) -> str:
         """Normalize column name by removing spaces and converting to uppercase."""
         return column.strip().upper().replace(' ', '')
 
-    def _validate_columns(self, df: pd.DataFrame) -> List[str]:
+    @staticmethod
+    @lru_cache(maxsize=64)
+    def _missing_columns(required: frozenset, columns: Tuple[str, ...]) -> frozenset:
+        """Required normalized headers absent from columns; cached per header row."""
+        return required.difference(map(ExcelReader._normalize_column_name, columns))
+
+    def _validate_columns(self, columns: Iterable[str]) -> List[str]:
         """Validate that all required columns are present."""
         errors = []
-        df_columns = {self._normalize_column_name(col) for col in df.columns}
-        required_columns = {self._normalize_column_name(col) 
-                          for col in self.column_mapping.keys() 
-                          if self.column_mapping[col] in self.required_fields}
-        
-        missing_columns = required_columns - df_columns
+        missing_columns = self._missing_columns(self._required_normalized, tuple(columns))
         if missing_columns:
             errors.append(f"Missing required columns: {', '.join(missing_columns)}")
             logger.error(
@@ -46,52 +140,117 @@ class ExcelReader:
             )
         return errors
 
-    def get_total_rows(self, file_path: Path) -> int:
-        """Get total number of rows in Excel file."""
+    @staticmethod
+    def _header_names(header: Tuple) -> List[str]:
+        """Name header cells like pandas: blanks become 'Unnamed: n', repeats get '.n' suffixes."""
+        names = []
+        seen: Dict[str, int] = {}
+        for i, value in enumerate(header):
+            name = f"Unnamed: {i}" if value is None else str(value)
+            if name in seen:
+                seen[name] += 1
+                name = f"{name}.{seen[name]}"
+            else:
+                seen[name] = 0
+            names.append(name)
+        return names
+
+    @staticmethod
+    def _load_workbook(file_path: Path):
+        """Open a workbook for streaming cell values only.
+
+        Read-only mode parses rows lazily, data_only returns cached formula
+        results instead of formulas, and keep_links=False skips loading
+        external workbook links that are never read.
+        """
+        return load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+
+    @contextmanager
+    def open(self, file_path: Path):
+        """Keep a single read-only workbook open for sizing and reading file_path."""
+        self._workbook = self._load_workbook(file_path)
+        self._workbook_path = Path(file_path)
         try:
-            df = pd.read_excel(file_path, engine='openpyxl')
-            return len(df)
-        except Exception as e:
-            logger.error(
-                "error_counting_rows",
-                error=str(e),
-                file=str(file_path)
-            )
-            raise
+            yield self
+        finally:
+            self._workbook.close()
+            self._workbook = None
+            self._workbook_path = None
 
-    def read_excel(self, file_path: Path, start_row: int = 0) -> Generator[Dict, None, None]:
-        """Read and preprocess Excel file data in chunks."""
+    @contextmanager
+    def _worksheet(self, file_path: Path):
+        """Yield the first sheet, reusing the workbook opened by open() when possible."""
+        if self._workbook is not None and self._workbook_path == Path(file_path):
+            yield self._workbook.active
+            return
+
+        workbook = self._load_workbook(file_path)
         try:
-            # Read the entire file first
-            df = pd.read_excel(
-                file_path,
-                engine='openpyxl',
-                skiprows=start_row
-            )
-            
-            # Validate columns before processing
-            column_errors = self._validate_columns(df)
-            if column_errors:
-                raise ValueError("\n".join(column_errors))
-            
-            # Create dynamic column mapping based on actual Excel columns
-            actual_mapping = {}
-            for col in df.columns:
-                normalized = self._normalize_column_name(col)
-                if normalized in self.column_variations:
-                    actual_mapping[col] = self.column_variations[normalized]
-            
-            # Process in chunks
-            total_rows = len(df)
-            for i in range(0, total_rows, self.chunk_size):
-                chunk = df.iloc[i:i + self.chunk_size]
-                records = self._process_chunks([chunk], actual_mapping)
-                for record in records:
-                    errors = self.validate_record(record)
-                    if not errors:
-                        yield record
-                    else:
-                        logger.warning("Validation errors for record:", errors=errors)
+            yield workbook.active
+        finally:
+            workbook.close()
+
+    def estimated_rows(self, file_path: Path) -> Optional[int]:
+        """Estimate the number of data rows from the sheet's dimension record.
+
+        The dimension is read from the sheet header without parsing any rows.
+        It includes blank rows within the used range, so it is only suitable
+        for progress reporting. Returns None when the sheet does not record
+        its size (some writers always store "A1"), rather than parsing the
+        whole sheet an extra time to count it.
+        """
+        with self._worksheet(file_path) as ws:
+            max_row = ws.max_row
+        if max_row is None or max_row <= 1:
+            return None
+        return max_row - 1
+
+    def read_chunks(self, file_path: Path, start_row: int = 0) -> Iterator[pd.DataFrame]:
+        """Read Excel file data as typed DataFrame chunks of at most chunk_size rows.
+
+        Rows are streamed from a read-only workbook, so memory stays bounded by
+        the chunk size. Each chunk is indexed by data row number (0 is the row
+        below the header), which is the position to resume from. Rows are not
+        validated; use validate_chunk to select the usable ones.
+        """
+        try:
+            with self._worksheet(file_path) as ws:
+                columns = self._header_names(next(ws.iter_rows(max_row=1, values_only=True), ()))
+
+                # Validate columns before processing
+                column_errors = self._validate_columns(columns)
+                if column_errors:
+                    raise ValueError("\n".join(column_errors))
+
+                # Create dynamic column mapping based on actual Excel columns
+                actual_mapping = {}
+                for col in columns:
+                    normalized = self._normalize_column_name(col)
+                    if normalized in self.column_variations:
+                        actual_mapping[col] = self.column_variations[normalized]
+
+                width = len(columns)
+                position = start_row
+                # Rows before a resume point are skipped by the reader itself
+                # rather than built into tuples and thrown away
+                rows = ws.iter_rows(min_row=start_row + 2, values_only=True)
+                while True:
+                    batch = list(islice(rows, self.chunk_size))
+                    if not batch:
+                        break
+
+                    # Formatted but empty rows, common at the end of a sheet, carry no data
+                    index, data = [], []
+                    for row_number, row in enumerate(batch, start=position):
+                        if any(value is not None for value in row):
+                            index.append(row_number)
+                            # Rows are ragged when the sheet records no dimension
+                            data.append(row[:width] if len(row) >= width else row + (None,) * (width - len(row)))
+                    position += len(batch)
+
+                    if data:
+                        chunk = pd.DataFrame(data, columns=columns, index=index)
+                        yield self._convert_chunk(chunk, actual_mapping)
 
         except Exception as e:
             logger.error(
@@ -102,79 +261,67 @@ class ExcelReader:
             )
             raise
 
-    def _process_chunks(self, chunk_iterator, column_mapping: Dict[str, str]) -> List[Dict]:
-        """Process chunks of data and return list of records."""
-        records = []
-        for chunk in chunk_iterator:
-            # Map columns to our field names using the dynamic mapping
-            df_mapped = chunk.rename(columns=column_mapping)
-
-            # Convert fields based on their types
-            for field, field_type in self.field_types.items():
-                if field not in df_mapped.columns:
-                    # Skip optional fields
-                    if field in self.required_fields:
-                        logger.warning(
-                            "missing_required_field",
-                            field=field
-                        )
-                    continue
-
-                try:
-                    if field_type == 'date':
-                        try:
-                            df_mapped[field] = pd.to_datetime(df_mapped[field], format='%d-%B-%Y').dt.date
-                        except:
-                            df_mapped[field] = pd.to_datetime(df_mapped[field]).dt.date
-                    elif field_type == 'time':
-                        # Handle various time formats
-                        df_mapped[field] = pd.to_datetime(df_mapped[field], format='mixed', errors='coerce').dt.time
-                    elif field_type == 'int':
-                        df_mapped[field] = pd.to_numeric(df_mapped[field], errors='coerce').fillna(0).astype(int)
-                    elif field_type == 'float':
-                        df_mapped[field] = pd.to_numeric(df_mapped[field], errors='coerce').fillna(0.0)
-                    elif field_type == 'str':
-                        df_mapped[field] = df_mapped[field].fillna('').astype(str).str.strip()
-                except Exception as e:
-                    logger.error(
-                        "type_conversion_error",
-                        field=field,
-                        field_type=field_type,
-                        error=str(e)
+    def _convert_chunk(self, chunk: pd.DataFrame, column_mapping: Dict[str, str]) -> pd.DataFrame:
+        """Rename a raw chunk to field names and convert each field to its type."""
+        # Map columns to our field names using the dynamic mapping
+        df_mapped = chunk.rename(columns=column_mapping)
+
+        # Convert fields based on their types
+        for field, field_type, convert in self._converters:
+            if field not in df_mapped.columns:
+                # Skip optional fields
+                if field in self.required_fields:
+                    logger.warning(
+                        "missing_required_field",
+                        field=field
                     )
-                    # Set default values for failed conversions
-                    if field_type == 'date':
-                        df_mapped[field] = None
-                    elif field_type == 'time':
-                        df_mapped[field] = None
-                    elif field_type == 'int':
-                        df_mapped[field] = 0
-                    elif field_type == 'float':
-                        df_mapped[field] = 0.0
-                    elif field_type == 'str':
-                        df_mapped[field] = ''
-
-            # Convert to list of dicts, only including fields we care about
-            available_fields = [f for f in self.field_types.keys() if f in df_mapped.columns]
-            chunk_records = df_mapped[available_fields].to_dict('records')
-            records.extend(chunk_records)
-
-        return records
-
-    def validate_record(self, record: Dict) -> List[str]:
-        """Validate a single record.
+                continue
 
-        Args:
-            record (Dict): Record to validate
+            try:
+                df_mapped[field] = convert(df_mapped[field])
+            except Exception as e:
+                logger.error(
+                    "type_conversion_error",
+                    field=field,
+                    field_type=field_type,
+                    error=str(e)
+                )
+                # Set default values for failed conversions
+                df_mapped[field] = _CONVERSION_DEFAULTS[field_type]
+
+        # Only keep the fields we care about
+        available_fields = [f for f in self.field_types.keys() if f in df_mapped.columns]
+        return df_mapped[available_fields]
+
+    def validate_chunk(self, df: pd.DataFrame) -> Tuple[pd.Series, Dict[int, List[str]]]:
+        """Validate a whole chunk at once.
 
-        Returns:
-            List[str]: List of validation error messages
+        Returns the valid-row mask and, for each invalid row index, the
+        messages describing what is wrong with that row.
         """
-        errors = []
-        # Check required fields
-        for field in self.required_fields:
-            if field not in record or pd.isna(record[field]):
-                errors.append(f"Missing required field: {field}")
-                logger.warning("validation_error", field=field, error="missing_or_null")
+        # Missing required columns count as missing in every row
+        checks = df.reindex(columns=self.required_fields).isna()
+        messages = [f"Missing required field: {field}" for field in self.required_fields]
 
-        return errors
+        for field, pattern in self.field_patterns.items():
+            if field in df.columns:
+                values = df[field].fillna('').astype(str)
+                checks[f"{field}:pattern"] = ~((values == '') | values.str.fullmatch(pattern))
+                messages.append(f"Invalid format for field: {field}")
+
+        for field in self._float_fields:
+            if field in df.columns:
+                values = pd.to_numeric(df[field], errors='coerce').to_numpy(dtype=float)
+                checks[f"{field}:finite"] = np.isinf(values)
+                messages.append(f"Invalid value for field: {field}")
+
+        failed = checks.to_numpy(dtype=bool)
+        invalid = failed.any(axis=1)
+        errors: Dict[int, List[str]] = {}
+        rows, cols = np.nonzero(failed)
+        for row, col in zip(rows.tolist(), cols.tolist()):
+            errors.setdefault(df.index[row], []).append(messages[col])
+
+        if errors:
+            logger.warning("validation_errors", invalid_rows=len(errors))
+        return pd.Series(~invalid, index=df.index), errors
@@ -1,6 +1,7 @@
 """LR ID generator module."""
-from datetime import datetime
-from typing import Dict
+from datetime import date
+from string import Formatter
+from typing import Dict, List, Optional, Tuple
 
 class LRGenerator:
     def __init__(self, id_pattern: str, branch_code: str = ""):
@@ -8,16 +9,70 @@ class LRGenerator:
         self.branch_code = branch_code
         self._sequence = 0
 
+        # Split the pattern around its {sequence} field once; patterns without
+        # exactly one plain {sequence} are formatted in full for every ID
+        parts = list(Formatter().parse(id_pattern))
+        sequence_parts = [i for i, part in enumerate(parts) if part[1] == 'sequence']
+        self._split: Optional[Tuple[list, str, str, list]] = None
+        if len(sequence_parts) == 1 and not parts[sequence_parts[0]][3]:
+            split = sequence_parts[0]
+            self._split = (parts[:split], parts[split][0], parts[split][2], parts[split + 1:])
+
+        # Date dependent parts, recomputed only when the day changes
+        self._cached_date: Optional[date] = None
+        self._fields: Dict[str, str] = {}
+        self._prefix = ''
+        self._suffix = ''
+
+    def _refresh_date(self):
+        today = date.today()
+        if today == self._cached_date:
+            return
+        self._cached_date = today
+        self._fields = {
+            'branch_code': self.branch_code,
+            'YYMMDD': today.strftime("%y%m%d"),
+        }
+        if self._split is not None:
+            before, literal, _, after = self._split
+            self._prefix = self._format_parts(before, self._fields) + literal
+            self._suffix = self._format_parts(after, self._fields)
+
     def generate_lr_id(self, record: Dict) -> str:
         """Generate a unique LR ID based on the pattern."""
-        now = datetime.now()
+        self._refresh_date()
         self._sequence += 1
-        
-        return self.id_pattern.format(
-            branch_code=self.branch_code,
-            YYMMDD=now.strftime("%y%m%d"),
-            sequence=self._sequence
-        )
+
+        if self._split is None:
+            return self.id_pattern.format(sequence=self._sequence, **self._fields)
+        return f"{self._prefix}{format(self._sequence, self._split[2])}{self._suffix}"
+
+    def generate_lr_ids(self, count: int) -> List[str]:
+        """Generate the next count LR IDs in one go.
+
+        The date and branch parts are formatted once per day and only the
+        sequence number is formatted per ID.
+        """
+        self._refresh_date()
+        start = self._sequence + 1
+        self._sequence += count
+
+        if self._split is None:
+            # Unusual pattern; format each ID in full
+            return [self.id_pattern.format(sequence=seq, **self._fields) for seq in range(start, start + count)]
+
+        prefix, suffix, spec = self._prefix, self._suffix, self._split[2]
+        return [f"{prefix}{format(seq, spec)}{suffix}" for seq in range(start, start + count)]
+
+    @staticmethod
+    def _format_parts(parts, fields: Dict) -> str:
+        """Reassemble parsed pattern parts and format them with fields."""
+        pattern = ''
+        for literal, name, spec, conversion in parts:
+            pattern += literal.replace('{', '{{').replace('}', '}}')
+            if name is not None:
+                pattern += '{' + name + (f'!{conversion}' if conversion else '') + (f':{spec}' if spec else '') + '}'
+        return pattern.format(**fields)
 
     def reset_sequence(self):
         """Reset the sequence counter."""
@@ -1,7 +1,9 @@
 """Monitoring and checkpoint management module."""
 import json
 import os
+import struct
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, Optional, Any
 import structlog
@@ -17,45 +19,136 @@ structlog.configure(
 
 logger = structlog.get_logger()
 
+# One journal entry: last_row, valid record count, error count
+_JOURNAL_RECORD = struct.Struct("<QQQ")
+
 class ProcessingCheckpoint:
-    def __init__(self, checkpoint_dir: Path):
+    """Checkpoint stored as a JSON header plus an append-only progress journal.
+
+    The header names the file being processed and is written once per file.
+    Each save appends a fixed-size binary record to the journal; only the
+    last complete record matters when resuming.
+    """
+
+    def __init__(self, checkpoint_dir: Path, sync_interval: int = 10):
         self.checkpoint_dir = checkpoint_dir
         self.checkpoint_file = checkpoint_dir / "checkpoint.json"
+        self.journal_file = checkpoint_dir / "checkpoint.journal"
+        self.sync_interval = max(1, sync_interval)
+        self._journal_fd = None
+        self._journal_for = None
+        self._unsynced = 0
+        self._syncer: Optional[ThreadPoolExecutor] = None
         os.makedirs(checkpoint_dir, exist_ok=True)
 
-    def save_progress(self, file: str, last_row: int, metadata: Optional[Dict] = None):
-        """Save processing progress to checkpoint file."""
-        checkpoint_data = {
-            'file': file,
-            'last_row': last_row,
-            'timestamp': time.time(),
-            'metadata': metadata or {}
-        }
-        
-        with open(self.checkpoint_file, 'w') as f:
-            json.dump(checkpoint_data, f)
-        
+    def _open_journal(self, file: str) -> int:
+        """Start a new journal for file, or reuse the one already open for it."""
+        if self._journal_fd is not None and self._journal_for == file:
+            return self._journal_fd
+
+        self.close()
+        header = self._read_header()
+        if header is None or header.get('file') != file:
+            self._write_header({'file': file, 'timestamp': time.time()})
+            flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+        else:
+            flags = os.O_WRONLY | os.O_CREAT | os.O_APPEND
+        self._journal_fd = os.open(self.journal_file, flags | getattr(os, 'O_BINARY', 0), 0o644)
+        self._journal_for = file
+        return self._journal_fd
+
+    def _write_header(self, header: Dict[str, Any]):
+        # Write to a temporary file and rename it into place, so a crash never
+        # leaves a half-written header behind
+        tmp_file = self.checkpoint_file.with_suffix('.tmp')
+        with open(tmp_file, 'wb') as f:
+            f.write(json.dumps(header).encode())
+        os.replace(tmp_file, self.checkpoint_file)
+
+    def _read_header(self) -> Optional[Dict[str, Any]]:
+        if not self.checkpoint_file.exists():
+            return None
+        return json.loads(self.checkpoint_file.read_bytes())
+
+    def save_progress(self, file: str, last_row: int, valid_count: int = 0, error_count: int = 0):
+        """Append a progress record for file to the checkpoint journal."""
+        fd = self._open_journal(file)
+        os.write(fd, _JOURNAL_RECORD.pack(last_row, valid_count, error_count))
+
+        # Syncing is batched and runs off the caller's thread; a crash loses
+        # at most the saves since the last completed sync
+        self._unsynced += 1
+        if self._unsynced >= self.sync_interval:
+            if self._syncer is None:
+                self._syncer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="checkpoint-sync")
+            self._syncer.submit(self._sync)
+            self._unsynced = 0
+
         logger.info(
             "checkpoint_saved",
             file=file,
             last_row=last_row,
-            **checkpoint_data.get('metadata', {})
+            valid_records=valid_count,
+            total_errors=error_count
         )
 
+    def _sync(self):
+        if self._journal_fd is not None:
+            getattr(os, 'fdatasync', os.fsync)(self._journal_fd)
+
     def load_progress(self) -> Optional[Dict[str, Any]]:
         """Load progress from checkpoint file if it exists."""
-        if self.checkpoint_file.exists():
-            with open(self.checkpoint_file) as f:
-                data = json.load(f)
-                logger.info("checkpoint_loaded", **data)
-                return data
-        return None
+        header = self._read_header()
+        if header is None or not self.journal_file.exists():
+            return None
+
+        with open(self.journal_file, 'rb') as f:
+            size = f.seek(0, os.SEEK_END)
+            # Ignore a torn record left by an interrupted write
+            size -= size % _JOURNAL_RECORD.size
+            if size == 0:
+                return None
+            f.seek(size - _JOURNAL_RECORD.size)
+            last_row, valid_count, error_count = _JOURNAL_RECORD.unpack(f.read(_JOURNAL_RECORD.size))
+
+        data = {
+            'file': header['file'],
+            'last_row': last_row,
+            'timestamp': os.path.getmtime(self.journal_file),
+            'metadata': {
+                'valid_records': valid_count,
+                'total_errors': error_count
+            }
+        }
+        logger.info("checkpoint_loaded", **data)
+        return data
+
+    def close(self):
+        """Sync and close the journal."""
+        if self._syncer is not None:
+            # Let queued syncs finish before the descriptor goes away
+            self._syncer.shutdown(wait=True)
+            self._syncer = None
+        if self._journal_fd is not None:
+            if self._unsynced:
+                self._sync()
+                self._unsynced = 0
+            os.close(self._journal_fd)
+            self._journal_fd = None
+            self._journal_for = None
 
     def clear_checkpoint(self):
         """Clear the checkpoint file."""
+        self.close()
         if self.checkpoint_file.exists():
             os.remove(self.checkpoint_file)
+            if self.journal_file.exists():
+                os.remove(self.journal_file)
             logger.info("checkpoint_cleared")
+        try:
+            os.rmdir(self.checkpoint_dir)
+        except OSError:  # Not empty, or already gone
+            pass
 
 class ProcessingMonitor:
     def __init__(self):
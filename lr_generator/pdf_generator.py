@@ -1,14 +1,73 @@
 """PDF generator module for creating LR documents."""
-from typing import Dict, List
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from operator import itemgetter
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4, landscape
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, KeepTogether, PageBreak, Spacer
+from io import BytesIO
+from reportlab.pdfgen import canvas
 from reportlab.lib.units import inch
+from reportlab.lib.utils import simpleSplit
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 
+try:
+    from pypdf import PdfWriter
+except ImportError:  # Parallel rendering needs pypdf to join the pieces
+    PdfWriter = None
+
+_LR_WIDTH = 7*inch
+_LR_PADDING = 10
+_LR_GAP = 0.2*inch
+_SECTION_GAP = 0.1*inch
+_CELL_PADDING = 6
+_TEMPLATE_FORM = 'lr_template'
+
+def _fitting_prefix(text: str, font_name: str, font_size: float, max_width: float) -> int:
+    """Length of the longest prefix of text that fits within max_width, at least 1."""
+    lo, hi = 1, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if pdfmetrics.stringWidth(text[:mid], font_name, font_size) <= max_width:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+@lru_cache(maxsize=4096)
+def _wrap_text(text: str, font_name: str, font_size: float, max_width: float) -> Tuple[str, ...]:
+    """Break text into lines that fit within max_width, as a Paragraph would."""
+    if '\n' not in text and pdfmetrics.stringWidth(text, font_name, font_size) <= max_width:
+        return (text,)
+    lines = []
+    for line in simpleSplit(text, font_name, font_size, max_width):
+        # simpleSplit keeps a word longer than the cell whole; break it up
+        while len(line) > 1 and pdfmetrics.stringWidth(line, font_name, font_size) > max_width:
+            cut = _fitting_prefix(line, font_name, font_size, max_width)
+            lines.append(line[:cut])
+            line = line[cut:]
+        lines.append(line)
+    return tuple(lines) or ('',)
+
+class _Layout(NamedTuple):
+    """Drawing operations for one LR, relative to its top-left corner."""
+    fills: List[tuple]
+    grids: List[tuple]
+    # (font name, font size, x, y, text)
+    labels: List[tuple]
+    # (font name, font size, x, y of the first line, max width, leading)
+    value_slots: List[tuple]
+    height: float
+
+def _render_shard(config: dict, records) -> bytes:
+    """Render records into a standalone PDF in a worker process."""
+    document = PDFGenerator(config).open_document()
+    document.add_records(records)
+    return document.getvalue()
+
 class PDFGenerator:
     def __init__(self, config: dict):
         self.config = config
@@ -43,115 +102,374 @@ class PDFGenerator:
             fontSize=self.pdf_format['fonts']['body']['size'],
             alignment=TA_LEFT
         )
+        
+        # The LR layout is fixed by the configuration, so every rule, label and
+        # value position is worked out once here and each record is then drawn
+        # with plain canvas calls
+        self._build_layout()
 
-    def create_lr_document(self, records: List[Dict], output_path: str):
-        """Create a PDF document with multiple LRs per page."""
-        doc = SimpleDocTemplate(
-            output_path,
-            pagesize=A4,
-            rightMargin=self.pdf_format['margins']['right']*inch,
-            leftMargin=self.pdf_format['margins']['left']*inch,
-            topMargin=self.pdf_format['margins']['top']*inch,
-            bottomMargin=self.pdf_format['margins']['bottom']*inch
-        )
+    def create_lr_document(self, records, output_path: str):
+        """Create a PDF document with multiple LRs per page.
 
-        # Process records in groups based on items_per_page
-        story = []
-        for i in range(0, len(records), self.items_per_page):
-            group = records[i:i + self.items_per_page]
-            story.extend(self._create_lr_group(group))
-            if i + self.items_per_page < len(records):
-                story.append(PageBreak())
+        With pdf_workers above 1 the records are split into runs of whole
+        pages, rendered in separate processes and joined with pypdf.
+        """
+        workers = self.config.get('pdf_workers', 1)
+        if workers > 1 and PdfWriter is not None:
+            shards = self._page_shards(records, workers)
+            if len(shards) > 1:
+                self._render_shards(shards, output_path, workers)
+                return
 
-        doc.build(story)
+        document = self.open_document()
+        document.add_records(records)
+        document.save(output_path)
 
-    def _create_lr_group(self, records: List[Dict]) -> List:
-        """Create a group of LRs for a single page."""
-        elements = []
-        
-        for record in records:
-            lr_elements = []
-            
-            # Add company branding at the top of each LR
-            lr_elements.append(Paragraph(self.company_name, self.brand_style))
-            lr_elements.append(Spacer(1, 0.1*inch))
-            
-            # Process each section according to configuration
-            for section in self.pdf_format['sections']:
-                if section['type'] != 'brand':  # Skip brand section as we handled it above
-                    section_elements = self._create_section(section, record)
-                    lr_elements.extend(section_elements)
-                    lr_elements.append(Spacer(1, 0.1*inch))
-            
-            # Create a box around the entire LR
-            box_data = [[lr_elements]]
-            box_table = Table(box_data, colWidths=[7*inch])
-            box_table.setStyle(TableStyle([
-                ('BOX', (0, 0), (-1, -1), 2, colors.black),
-                ('TOPPADDING', (0, 0), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
-                ('LEFTPADDING', (0, 0), (-1, -1), 10),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 10),
-            ]))
-            
-            # Keep all elements of a single LR together
-            elements.append(KeepTogether(box_table))
-            elements.append(Spacer(1, 0.2*inch))
-
-        return elements
-
-    def _create_section(self, section: Dict, record: Dict) -> List:
-        """Create a section of the LR based on configuration."""
-        elements = []
-        
-        if section['type'] == 'header':
-            # Create header table
-            data = []
-            row = []
-            for field in section['fields']:
-                value = record.get(field['name'], 'N/A')
-                row.extend([Paragraph(field['label'], self.header_style),
-                          Paragraph(str(value), self.body_style)])
-            data.append(row)
-            
-            widths = [field['width']*0.5*inch for field in section['fields'] for _ in range(2)]
-            table = Table(data, colWidths=widths)
-            table.setStyle(self._get_table_style())
-            elements.append(table)
-            
-        elif section['type'] in ['body', 'footer']:
-            # Create body/footer table
-            data = []
-            for field in section['fields']:
-                value = record.get(field['name'], 'N/A')
-                data.append([Paragraph(field['label'], self.body_style),
-                            Paragraph(str(value), self.body_style)])
-            
-            # Calculate widths based on the configuration
-            total_width = sum(field['width'] for field in section['fields'])
-            label_ratio = 0.3  # 30% for labels
-            widths = [2*inch, 5*inch]
-            
-            table = Table(data, colWidths=widths)
-            style = self._get_table_style()
-            if section.get('box', False):
-                style.add('BOX', (0, 0), (-1, -1), 1, colors.black)
-            table.setStyle(style)
-            elements.append(table)
-        
-        return elements
-
-    def _get_table_style(self) -> TableStyle:
-        """Get the common table style."""
-        return TableStyle([
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), self.pdf_format['fonts']['body']['name']),
-            ('FONTSIZE', (0, 0), (-1, -1), self.pdf_format['fonts']['body']['size']),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('TOPPADDING', (0, 0), (-1, -1), 6),
-            ('LEFTPADDING', (0, 0), (-1, -1), 6),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 6),
-        ])
+    def open_document(self) -> 'LRDocument':
+        """Start a document that LRs can be added to as they are produced."""
+        return LRDocument(self)
+
+    def _page_shards(self, records, workers: int) -> List:
+        """Split records into at most workers runs of whole pages.
+
+        Pages are cut where LRDocument would start them, so the joined
+        shards paginate exactly like a document rendered in one go.
+        """
+        if not hasattr(records, 'iloc'):
+            records = list(records)
+        starts = self._page_starts(records)
+        pages_per_shard = -(-len(starts) // workers)
+        bounds = starts[::pages_per_shard] + [len(records)]
+        if hasattr(records, 'iloc'):
+            return [records.iloc[start:end] for start, end in zip(bounds, bounds[1:])]
+        return [records[start:end] for start, end in zip(bounds, bounds[1:])]
+
+    def _page_starts(self, records) -> List[int]:
+        """Index of the first record on each page of a document of records."""
+        cursor = _PageCursor(self)
+        starts = [0]
+        for index, values in enumerate(self._record_values(records)):
+            _, layout = self._wrap_values(values)
+            new_page, _ = cursor.place(self.lr_height if layout is None else layout.height)
+            if new_page:
+                starts.append(index)
+        return starts
+
+    def _render_shards(self, shards: List, output_path: str, workers: int):
+        writer = PdfWriter()
+        with ProcessPoolExecutor(max_workers=min(workers, len(shards))) as pool:
+            for data in pool.map(_render_shard, [self.config] * len(shards), shards):
+                writer.append(BytesIO(data))
+        with open(output_path, 'wb') as f:
+            writer.write(f)
+
+    def _build_layout(self):
+        """Precompute the drawing operations for one LR.
+
+        Coordinates are relative to the top-left corner of the LR box, with y
+        growing downwards as negative values. Cells keep the padding, grid and
+        label shading the LRs have always had.
+        """
+        self.lr_width = _LR_WIDTH
+        self._tables = self._section_tables()
+
+        # The value each cell shows and the table row it sits in, counting
+        # rows across all sections
+        self._value_fields = []
+        self._value_rows = []
+        row_index = 0
+        for rows, _, _ in self._tables:
+            for row in rows:
+                for field in row:
+                    self._value_fields.append(field['name'])
+                    self._value_rows.append(row_index)
+                row_index += 1
+        self._row_count = row_index
+
+        # Every value on one line; records with longer values get a taller
+        # layout, worked out once for each combination of row heights
+        self._layout = self._layout_for(())
+        self._tall_layouts: Dict[tuple, _Layout] = {}
+        self.lr_height = self._layout.height
+
+        # All values an LR shows, pulled from a record dict in one call
+        names = self._value_fields
+        if len(names) > 1:
+            self._record_getter = itemgetter(*names)
+        else:
+            self._record_getter = lambda record: tuple(record[name] for name in names)
+
+        # LR slots down the page: as many as fit inside the margins, up to
+        # items_per_page, centred horizontally. Taller LRs take more room, so
+        # LRDocument places them by height and only uses these as the limit
+        margins = self.pdf_format['margins']
+        self.page_size = A4
+        frame_x = margins['left']*inch
+        frame_width = self.page_size[0] - (margins['left'] + margins['right'])*inch
+        frame_height = self.page_size[1] - (margins['top'] + margins['bottom'])*inch
+        pitch = self.lr_height + _LR_GAP
+        fits = int((frame_height - 2*_CELL_PADDING + _LR_GAP) // pitch)
+        per_page = max(1, min(self.items_per_page, fits))
+        slot_x = frame_x + _CELL_PADDING + (frame_width - 2*_CELL_PADDING - self.lr_width) / 2
+        top = self.page_size[1] - margins['top']*inch - _CELL_PADDING
+        self.page_slots = [(slot_x, top - i*pitch) for i in range(per_page)]
+        self.page_bottom = margins['bottom']*inch + _CELL_PADDING
+
+    def _section_tables(self) -> List[tuple]:
+        """(rows, column widths, label style) for each section, in order.
+
+        Sections without a table have no rows but still take a section gap.
+        """
+        tables = []
+        for section in self.pdf_format['sections']:
+            if section['type'] == 'brand':  # Drawn separately at the top of each LR
+                continue
+            fields = section.get('fields', [])
+            if section['type'] == 'header':
+                tables.append(([fields], [field['width']*0.5*inch for field in fields for _ in range(2)],
+                               self.header_style))
+            elif section['type'] in ['body', 'footer']:
+                tables.append(([[field] for field in fields], [2*inch, 5*inch], self.body_style))
+            else:
+                tables.append(([], [], None))
+        return tables
+
+    def _layout_for(self, row_lines: tuple) -> _Layout:
+        """Lay out one LR whose table rows hold row_lines lines of values.
+
+        An empty row_lines gives every row a single line.
+        """
+        fills, grids, labels, value_slots = [], [], [], []
+        layout = _Layout(fills, grids, labels, value_slots, 0)
+        x = _LR_PADDING
+        y = -_LR_PADDING
+
+        # Company branding at the top of each LR
+        brand = self.brand_style
+        brand_width = pdfmetrics.stringWidth(self.company_name, brand.fontName, brand.fontSize)
+        labels.append((brand.fontName, brand.fontSize, (self.lr_width - brand_width) / 2,
+                       y - brand.fontSize, self.company_name))
+        y -= brand.leading + brand.spaceAfter + _SECTION_GAP
+
+        row_index = 0
+        for rows, widths, label_style in self._tables:
+            if rows:
+                lines = row_lines[row_index:row_index + len(rows)] or (1,) * len(rows)
+                y = self._layout_table(layout, rows, lines, widths, label_style, x, y)
+                row_index += len(rows)
+            y -= _SECTION_GAP
+
+        # Labels grouped by font so each LR switches fonts as few times as possible
+        labels.sort(key=lambda label: (label[0], label[1]))
+        return layout._replace(height=_LR_PADDING - y)
+
+    def _layout_table(self, layout: _Layout, rows: List[List[Dict]], row_lines: tuple,
+                      widths: List[float], label_style: ParagraphStyle,
+                      x: float, top: float) -> float:
+        """Lay out label/value cell pairs row by row; returns the table bottom."""
+        value_style = self.body_style
+        xs = [x]
+        for width in widths:
+            xs.append(xs[-1] + width)
+        ys = [top]
+
+        for row, lines in zip(rows, row_lines):
+            height = max(label_style.leading, value_style.leading*lines) + 2*_CELL_PADDING
+            bottom = ys[-1] - height
+            for i, field in enumerate(row):
+                label_x, value_x = xs[2*i], xs[2*i + 1]
+                # Cell contents sit on the bottom padding, as in a Table cell
+                layout.labels.append((
+                    label_style.fontName, label_style.fontSize, label_x + _CELL_PADDING,
+                    bottom + _CELL_PADDING + label_style.leading - label_style.fontSize,
+                    field['label'],
+                ))
+                layout.value_slots.append((
+                    value_style.fontName, value_style.fontSize,
+                    value_x + _CELL_PADDING,
+                    bottom + _CELL_PADDING + value_style.leading*lines - value_style.fontSize,
+                    widths[2*i + 1] - 2*_CELL_PADDING,
+                    value_style.leading,
+                ))
+            ys.append(bottom)
+
+        # Label column shading and the grid over every cell
+        layout.fills.append((xs[0], ys[-1], widths[0], top - ys[-1]))
+        layout.grids.append((xs, ys))
+        return ys[-1]
+
+    def _record_values(self, records) -> Iterator[tuple]:
+        """Yield the displayed values of each record, in value slot order.
+
+        records may be dicts or a DataFrame. Fields a record lacks show as N/A.
+        """
+        names = self._value_fields
+        if hasattr(records, 'columns'):
+            columns = [
+                records[name].tolist() if name in records.columns else ['N/A'] * len(records)
+                for name in names
+            ]
+            return zip(*columns)
+
+        def values(record: Dict) -> tuple:
+            try:
+                return self._record_getter(record)
+            except KeyError:
+                return tuple(record.get(name, 'N/A') for name in names)
+        return map(values, records)
+
+    def _define_template(self, c: canvas.Canvas):
+        """Record the parts of an LR that never change as a reusable form on c.
+
+        The form is written to the PDF once and placed for every LR whose
+        values fit on one line, so only the values are drawn per record.
+        """
+        # The header row may run past the LR box, so the form's bounds are generous
+        c.beginForm(_TEMPLATE_FORM, lowerx=-self.lr_width, lowery=-2*self.lr_height,
+                    upperx=2*self.lr_width, uppery=self.lr_height)
+        self._draw_static(c, self._layout)
+        c.endForm()
+
+    def _draw_static(self, c: canvas.Canvas, layout: _Layout):
+        """Draw the shading, rules and labels of layout."""
+        c.setFillColor(colors.lightgrey)
+        for rect in layout.fills:
+            c.rect(*rect, stroke=0, fill=1)
+        c.setFillColor(colors.black)
+        c.setLineCap(1)  # Round caps, as Table draws its rules
+        c.setLineWidth(1)
+        for xs, ys in layout.grids:
+            c.grid(xs, ys)
+        c.setLineWidth(2)
+        c.rect(0, -layout.height, self.lr_width, layout.height)
+
+        font = None
+        for font_name, font_size, tx, ty, text in layout.labels:
+            if font != (font_name, font_size):
+                font = (font_name, font_size)
+                c.setFont(font_name, font_size)
+            c.drawString(tx, ty, text)
+
+    def _wrap_values(self, values: tuple) -> Tuple[List[Tuple[str, ...]], Optional[_Layout]]:
+        """Break values into lines for their cells.
+
+        Returns the lines and, if any value needs more than one line, the
+        taller layout the LR has to be drawn with.
+        """
+        wrapped = [
+            _wrap_text(str(value), font_name, font_size, max_width)
+            for value, (font_name, font_size, _, _, max_width, _) in zip(values, self._layout.value_slots)
+        ]
+        if all(len(lines) == 1 for lines in wrapped):
+            return wrapped, None
+
+        row_lines = [1] * self._row_count
+        for lines, row in zip(wrapped, self._value_rows):
+            row_lines[row] = max(row_lines[row], len(lines))
+        row_lines = tuple(row_lines)
+        layout = self._tall_layouts.get(row_lines)
+        if layout is None:
+            layout = self._tall_layouts[row_lines] = self._layout_for(row_lines)
+        return wrapped, layout
+
+    def _draw_lr(self, c: canvas.Canvas, wrapped: List[Tuple[str, ...]],
+                 layout: Optional[_Layout], x: float, y: float):
+        """Draw one LR with its top-left corner at (x, y).
+
+        wrapped and layout are as returned by _wrap_values.
+        """
+        c.saveState()
+        c.translate(x, y)
+        if layout is None:
+            c.doForm(_TEMPLATE_FORM)
+            layout = self._layout
+        else:
+            self._draw_static(c, layout)
+
+        font = None
+        for lines, (font_name, font_size, tx, ty, _, leading) in zip(wrapped, layout.value_slots):
+            if font != (font_name, font_size):
+                font = (font_name, font_size)
+                c.setFont(font_name, font_size)
+            for line in lines:
+                c.drawString(tx, ty, line)
+                ty -= leading
+
+        c.restoreState()
+
+
+class _PageCursor:
+    """Where the next LR goes down the page.
+
+    Pages hold at most items_per_page LRs, and an LR that does not fit in
+    the room left on the page starts a new one.
+    """
+
+    def __init__(self, generator: PDFGenerator):
+        self._per_page = len(generator.page_slots)
+        self.x, self._top = generator.page_slots[0]
+        self._bottom = generator.page_bottom
+        self._y = self._top
+        self._on_page = 0
+
+    def place(self, height: float) -> Tuple[bool, float]:
+        """Make room for an LR of height.
+
+        Returns whether it starts a new page and the y of its top edge.
+        """
+        new_page = self._on_page > 0 and (
+            self._on_page == self._per_page
+            # Rounding slack, so LRs of the usual height always fit
+            or self._y - height < self._bottom - 0.01)
+        if new_page:
+            self._y = self._top
+            self._on_page = 0
+        top = self._y
+        self._y -= height + _LR_GAP
+        self._on_page += 1
+        return new_page, top
+
+
+class LRDocument:
+    """A PDF that LR records are laid out into as they arrive.
+
+    Each LR is drawn onto the current page straight away, so records do not
+    have to be collected before the document is built. Pages hold at most
+    items_per_page LRs, as in create_lr_document, and an LR made taller by
+    long values moves to a new page when it does not fit on the current one.
+    """
+
+    def __init__(self, generator: PDFGenerator):
+        self.generator = generator
+        self.record_count = 0
+        self._page_size = generator.page_size
+        self._cursor = _PageCursor(generator)
+        self._buffer = BytesIO()
+        self._canvas = canvas.Canvas(self._buffer, pagesize=self._page_size)
+        generator._define_template(self._canvas)
+
+    def add_records(self, records):
+        """Lay out records after the LRs already in the document.
+
+        records may be dicts or a DataFrame; a DataFrame is read column by
+        column without converting it to dicts first.
+        """
+        generator = self.generator
+        for values in generator._record_values(records):
+            wrapped, layout = generator._wrap_values(values)
+            new_page, y = self._cursor.place(generator.lr_height if layout is None else layout.height)
+            if new_page:
+                self._canvas.showPage()
+            generator._draw_lr(self._canvas, wrapped, layout, self._cursor.x, y)
+            self.record_count += 1
+
+    def getvalue(self) -> bytes:
+        """Finish the document and return the PDF data."""
+        self._canvas.save()
+        return self._buffer.getvalue()
+
+    def save(self, output_path: str):
+        """Finish the document and write it to output_path."""
+        data = self.getvalue()
+        with open(output_path, 'wb') as f:
+            f.write(data)
@@ -0,0 +1,110 @@
+"""Background stages that overlap Excel parsing, validation and database writes."""
+import queue
+import threading
+from typing import Callable, Iterable, Iterator, Optional, TypeVar
+import structlog
+
+logger = structlog.get_logger()
+
+T = TypeVar('T')
+
+_DONE = object()
+
+
+class _Failure:
+    """Carries an exception raised in a worker thread back to the consumer."""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def prefetch(iterable: Iterable[T], maxsize: int = 8) -> Iterator[T]:
+    """Iterate over iterable in a background thread, buffering up to maxsize items.
+
+    The producer keeps parsing while the consumer works on the previous
+    item. Exceptions raised by the producer are re-raised in the consumer.
+    """
+    items: queue.Queue = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except BaseException as e:
+            put(_Failure(e))
+            return
+        put(_DONE)
+
+    producer = threading.Thread(target=produce, name="prefetch", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        # Unblock the producer if the consumer stopped early
+        stop.set()
+        producer.join()
+
+
+class BackgroundWriter:
+    """Runs submitted jobs in order on a single worker thread.
+
+    Used as a context manager; leaving the block waits for queued jobs to
+    finish and re-raises the first error any of them raised.
+    """
+
+    def __init__(self, maxsize: int = 8):
+        self._jobs: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._jobs.put(_DONE)
+        self._thread.join()
+        if exc_type is None:
+            self._raise_error()
+        return False
+
+    def submit(self, fn: Callable, *args, **kwargs):
+        """Queue fn(*args, **kwargs), blocking while the queue is full."""
+        self._raise_error()
+        self._jobs.put((fn, args, kwargs))
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is _DONE:
+                return
+            if self._error is not None:
+                # Drop remaining jobs after a failure
+                continue
+            fn, args, kwargs = job
+            try:
+                fn(*args, **kwargs)
+            except BaseException as e:
+                logger.error("background_job_failed", error=str(e))
+                self._error = e
@@ -1,16 +1,24 @@
 """Print management module."""
 import os
+import subprocess
 import win32print
 import win32api
+import win32event
 import time
 from pathlib import Path
 from typing import Optional
 
+# Any job added, set, written or deleted (PRINTER_CHANGE_JOB)
+_PRINTER_CHANGE_JOB = getattr(win32print, 'PRINTER_CHANGE_JOB', 0x0000FF00)
+
 class PrintManager:
-    def __init__(self, printer_name: str, copies: int = 1, timeout_seconds: int = 30):
+    def __init__(self, printer_name: str, copies: int = 1, timeout_seconds: int = 30,
+                 sumatra_path: Optional[str] = None):
         self.printer_name = printer_name
         self.copies = copies
         self.timeout_seconds = timeout_seconds
+        # Optional SumatraPDF executable for printing all copies in one job
+        self.sumatra_path = sumatra_path
 
     def print_pdf(self, pdf_path: Path) -> bool:
         """Print a PDF file. Returns True if successful, False otherwise."""
@@ -22,13 +30,16 @@ class PrintManager:
             if self.printer_name.lower() == "microsoft print to pdf":
                 return True
 
+            if self.sumatra_path:
+                return self._print_with_sumatra(pdf_path)
+
             # Get printer handle
             printer_handle = win32print.OpenPrinter(self.printer_name)
             
             try:
                 # Print the file
                 for _ in range(self.copies):
-                    job_id = win32api.ShellExecute(
+                    win32api.ShellExecute(
                         0,
                         "print",
                         str(pdf_path),
@@ -38,12 +49,7 @@ class PrintManager:
                     )
                     
                     # Wait for print job to complete or timeout
-                    start_time = time.time()
-                    while time.time() - start_time < self.timeout_seconds:
-                        job_info = win32print.GetJob(printer_handle, job_id, 1)
-                        if job_info['Status'] == win32print.JOB_STATUS_PRINTED:
-                            break
-                        time.sleep(1)
+                    self._wait_for_job(printer_handle, pdf_path.name)
                     
                 return True
             finally:
@@ -53,6 +59,55 @@ class PrintManager:
             print(f"Print error: {str(e)}")
             return False
 
+    def _wait_for_job(self, printer_handle, document_name: str):
+        """Block until the spooler has finished the job for document_name or the timeout passes.
+
+        ShellExecute does not return a job id, so the job is found by document
+        name. The spooler wakes us on every job change instead of being polled.
+        """
+        change_handle = win32print.FindFirstPrinterChangeNotification(
+            printer_handle, _PRINTER_CHANGE_JOB, 0, None
+        )
+        try:
+            deadline = time.time() + self.timeout_seconds
+            seen = False
+            while True:
+                jobs = [
+                    job for job in win32print.EnumJobs(printer_handle, 0, -1, 1)
+                    if document_name in (job.get('pDocument') or '')
+                ]
+                if jobs:
+                    seen = True
+                    if all(job['Status'] & win32print.JOB_STATUS_PRINTED for job in jobs):
+                        return
+                elif seen:
+                    # Job has left the queue
+                    return
+
+                remaining_ms = int((deadline - time.time()) * 1000)
+                if remaining_ms <= 0:
+                    return
+                if win32event.WaitForSingleObject(change_handle, remaining_ms) != win32event.WAIT_OBJECT_0:
+                    return
+                # Re-arm the notification before checking the queue again
+                win32print.FindNextPrinterChangeNotification(change_handle, 0)
+        finally:
+            win32print.FindClosePrinterChangeNotification(change_handle)
+
+    def _print_with_sumatra(self, pdf_path: Path) -> bool:
+        """Print every copy as a single spool job through SumatraPDF."""
+        result = subprocess.run(
+            [
+                self.sumatra_path,
+                "-print-to", self.printer_name,
+                "-print-settings", f"{self.copies}x",
+                "-silent",
+                str(pdf_path)
+            ],
+            timeout=self.timeout_seconds
+        )
+        return result.returncode == 0
+
     @staticmethod
     def get_available_printers() -> list:
         """Get list of available printers."""
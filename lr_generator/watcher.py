@@ -1,98 +1,325 @@
 """File watcher module for monitoring Excel files."""
+import fnmatch
+import re
+import stat
+import threading
 import time
 import os
+from collections import OrderedDict
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Set, Callable, Optional
+from typing import Dict, List, NamedTuple, Set, Callable, Optional, Tuple
+import structlog
 from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler, FileCreatedEvent, FileModifiedEvent
+from watchdog.observers.polling import PollingObserverVFS
+from watchdog.events import FileSystemEventHandler, FileCreatedEvent, FileModifiedEvent, FileClosedEvent, FileMovedEvent
+
+try:
+    from watchdog.observers.inotify import InotifyObserver
+except ImportError:  # Not on Linux
+    InotifyObserver = None
+
+class _EntryStat(NamedTuple):
+    """The stat fields DirectorySnapshot uses, taken from a directory entry."""
+    st_mode: int
+    st_ino: int
+    st_dev: int
+    st_size: int
+    st_mtime: float
+
+class _ScandirStat:
+    """listdir/stat pair for PollingObserverVFS built on one scan per poll.
+
+    Attributes come from the directory listing itself (FindFirstFile/
+    FindNextFile on Windows) instead of a separate stat call per file,
+    which is what makes polling a network share expensive.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, _EntryStat] = {}
+
+    def listdir(self, path: str):
+        entries = list(os.scandir(path))
+        for entry in entries:
+            try:
+                st = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            # Directory entries carry no inode on Windows; the path stands in
+            # so snapshots still tell files apart
+            self._entries[os.path.join(path, entry.name)] = _EntryStat(
+                st.st_mode, st.st_ino or hash(entry.path), st.st_dev, st.st_size, st.st_mtime
+            )
+        return entries
+
+    def stat(self, path: str):
+        st = self._entries.pop(path, None)
+        return st if st is not None else os.stat(path)
+
+def _is_network_path(path: str) -> bool:
+    return path.startswith(('\\\\', '//'))
+
+def _compile_patterns(patterns: List[str]) -> Callable[[str], Optional[re.Match]]:
+    """Build a single matcher for file names against any of the glob patterns."""
+    if not patterns:
+        return lambda name: None
+    return re.compile('|'.join(fnmatch.translate(os.path.normcase(p)) for p in patterns)).match
+
+logger = structlog.get_logger()
+
+# Number of processed files remembered so repeated events do not reprocess them
+_SEEN_FILES_LIMIT = 10_000
 
 class ExcelFileHandler(FileSystemEventHandler):
     def __init__(self, patterns: List[str], ignore_patterns: List[str], 
                  stabilization_seconds: int, process_callback: Callable[[Path], bool],
-                 delete_after_processing: bool = True):
+                 delete_after_processing: bool = True, wait_for_close: bool = False,
+                 executor: Optional[ThreadPoolExecutor] = None,
+                 processed_dir: Optional[Path] = None):
         self.patterns = patterns
         self.ignore_patterns = ignore_patterns
+        # Patterns are matched against the file name, compiled once for all events
+        self._match = _compile_patterns(patterns)
+        self._ignore_match = _compile_patterns(ignore_patterns)
         self.stabilization_seconds = stabilization_seconds
         self.process_callback = process_callback
         self.delete_after_processing = delete_after_processing
-        self.processing_files: Set[Path] = set()
-        self.seen_files: Set[Path] = set()
+        # Where processed files are moved instead of being deleted; a rename
+        # within the same filesystem only touches directory metadata
+        self.processed_dir = processed_dir
+        # With inotify the kernel reports when a writer closes the file
+        # (IN_CLOSE_WRITE), so there is no need to poll for a stable size
+        self.wait_for_close = wait_for_close
+        # Files are tracked by normcased path string; seen_files remembers
+        # the most recent _SEEN_FILES_LIMIT files so it cannot grow forever.
+        # Both are shared by the worker threads and only touched under
+        # _processing_lock
+        self.processing_files: Set[str] = set()
+        self._processing_lock = threading.Lock()
+        self.seen_files: "OrderedDict[str, None]" = OrderedDict()
+        # Bursts of events for a file are collapsed into one, dispatched once
+        # the file has been quiet for stabilization_seconds
+        self._pending: Dict[str, threading.Timer] = {}
+        self._pending_lock = threading.Lock()
+        # Files are processed off the observer thread, several at a time
+        self._executor = executor or ThreadPoolExecutor(max_workers=4, thread_name_prefix="lr-file")
 
     def on_created(self, event):
+        # Under inotify this is also how a file moved in from another
+        # directory arrives (an IN_MOVED_TO with no matching IN_MOVED_FROM);
+        # it gets no close event, so it goes through the quiet period too
         if not isinstance(event, FileCreatedEvent):
             return
-        self._handle_file_event(event)
+        self._handle_file_event(event.src_path)
 
     def on_modified(self, event):
-        if not isinstance(event, FileModifiedEvent):
+        if not isinstance(event, FileModifiedEvent) or self.wait_for_close:
+            return
+        self._handle_file_event(event.src_path)
+
+    def on_closed(self, event):
+        if not isinstance(event, FileClosedEvent):
             return
-        self._handle_file_event(event)
+        self._handle_file_event(event.src_path, wait_for_stability=False)
 
-    def _handle_file_event(self, event):
-        file_path = Path(event.src_path)
-        if not self._is_valid_file(file_path):
+    def on_moved(self, event):
+        # Files renamed into place (e.g. saved to a temporary name first) never
+        # get a close event under their final name; a rename is atomic, so
+        # with inotify the file is complete as soon as it arrives
+        if not isinstance(event, FileMovedEvent):
             return
+        self._handle_file_event(event.dest_path, wait_for_stability=not self.wait_for_close)
 
-        if file_path in self.processing_files:
+    def _handle_file_event(self, path: str, wait_for_stability: bool = True):
+        if not self._is_valid_file(path):
             return
 
-        self.processing_files.add(file_path)
-        self._wait_for_file_stability(file_path)
+        key = os.path.normcase(path)
+        if not wait_for_stability:
+            # The file is complete; a quiet period still pending for it is moot
+            with self._pending_lock:
+                previous = self._pending.pop(key, None)
+            if previous is not None:
+                previous.cancel()
+            self._submit(key, path, debounced=False)
+            return
+
+        # Restart the quiet period on every event for the file
+        timer = threading.Timer(self.stabilization_seconds, self._dispatch, args=(key, path))
+        timer.daemon = True
+        with self._pending_lock:
+            previous = self._pending.pop(key, None)
+            if previous is not None:
+                previous.cancel()
+            self._pending[key] = timer
+        timer.start()
+
+    def _dispatch(self, key: str, path: str):
+        """Hand path to the worker pool once its quiet period is over."""
+        with self._pending_lock:
+            timer = self._pending.get(key)
+            if timer is not threading.current_thread():
+                # Superseded by a newer event, or already dispatched on close
+                return
+            del self._pending[key]
+        self._submit(key, path, debounced=True)
+
+    def _submit(self, key: str, path: str, debounced: bool):
+        try:
+            self._executor.submit(self._run, key, path, debounced)
+        except RuntimeError:  # Shutting down
+            pass
+
+    def _run(self, key: str, path: str, debounced: bool = False):
+        with self._processing_lock:
+            if key in self.processing_files:
+                return
+            self.processing_files.add(key)
+        try:
+            try:
+                st = os.stat(path)
+            except OSError:  # Removed or renamed again before its turn
+                return
+            if (debounced and self.wait_for_close
+                    and time.time() - st.st_mtime < self.stabilization_seconds):
+                # With inotify no write events are subscribed to, so a file
+                # created in place may still be being written; wait for its
+                # close event or another quiet period. Moved-in files keep
+                # their original mtime and go straight through
+                self._handle_file_event(path)
+                return
+            # A file created but not yet written to is left alone without
+            # being marked as seen; the first write raises a new event for it
+            if stat.S_ISREG(st.st_mode) and st.st_size > 0:
+                self._process_file(key, path)
+        finally:
+            with self._processing_lock:
+                self.processing_files.discard(key)
 
-    def _is_valid_file(self, file_path: Path) -> bool:
-        if not file_path.is_file():
-            return False
+    def shutdown(self, wait: bool = True):
+        """Drop files still in their quiet period and stop the workers.
 
-        if any(file_path.match(pattern) for pattern in self.ignore_patterns):
-            return False
+        With wait, returns once the files already being processed are done.
+        """
+        with self._pending_lock:
+            timers = list(self._pending.values())
+            self._pending.clear()
+        for timer in timers:
+            timer.cancel()
+        self._executor.shutdown(wait=wait)
 
-        return any(file_path.match(pattern) for pattern in self.patterns)
+    def _is_valid_file(self, path: str) -> bool:
+        # Only file events reach here, so the name is all there is to check;
+        # whether the file still exists is checked once, when it is processed,
+        # rather than with a stat for every event in a burst
+        name = os.path.normcase(os.path.basename(path))
+        return not self._ignore_match(name) and bool(self._match(name))
 
-    def _wait_for_file_stability(self, file_path: Path):
-        """Wait for file to stabilize (no size changes)."""
-        last_size = -1
-        current_size = file_path.stat().st_size
+    def _process_file(self, key: str, path: str):
+        """Run the callback once per file and delete the file if configured.
 
-        while last_size != current_size:
-            time.sleep(self.stabilization_seconds)
-            last_size = current_size
-            if file_path.exists():
-                current_size = file_path.stat().st_size
-            else:
-                self.processing_files.remove(file_path)
+        A file stays in seen_files while it is left in watch_dir, so further
+        events for it are ignored; once it is moved or deleted its name is
+        free for the next file.
+        """
+        with self._processing_lock:
+            if key in self.seen_files:
+                self.seen_files.move_to_end(key)
                 return
+            self.seen_files[key] = None
+            if len(self.seen_files) > _SEEN_FILES_LIMIT:
+                self.seen_files.popitem(last=False)
 
-        if file_path not in self.seen_files:
-            self.seen_files.add(file_path)
-            try:
-                # Process the file
-                success = self.process_callback(file_path)
-                
-                # Delete file if processing was successful and deletion is enabled
-                if success and self.delete_after_processing:
-                    try:
+        file_path = Path(path)
+        try:
+            # Process the file
+            success = self.process_callback(file_path)
+            
+            # Remove file if processing was successful and deletion is enabled
+            if success and self.delete_after_processing:
+                try:
+                    if self.processed_dir is not None:
+                        target = self._processed_target(file_path)
+                        file_path.replace(target)
+                        logger.info("processed_file_moved", file=path, target=str(target))
+                    else:
                         os.remove(file_path)
-                        print(f"Deleted processed file: {file_path}")
-                    except Exception as e:
-                        print(f"Error deleting file {file_path}: {str(e)}")
-                        
-            except Exception as e:
-                print(f"Error processing file {file_path}: {str(e)}")
+                        logger.info("processed_file_deleted", file=path)
+                    # The file is gone, so a file dropped in later under the
+                    # same name is a new workbook and must be processed too
+                    with self._processing_lock:
+                        self.seen_files.pop(key, None)
+                except Exception as e:
+                    logger.error("error_removing_file", file=path, error=str(e))
+                    
+        except Exception as e:
+            logger.error("error_processing_file", file=path, error=str(e))
 
-        self.processing_files.remove(file_path)
+    def _processed_target(self, file_path: Path) -> Path:
+        """Where file_path goes in processed_dir, without overwriting an earlier file.
+
+        Workbooks are often re-exported under the same name, so a name that
+        is already taken gets a timestamp, and a counter if that is taken too.
+        """
+        target = self.processed_dir / file_path.name
+        if not target.exists():
+            return target
+        stem = f"{file_path.stem}_{datetime.now():%Y%m%d-%H%M%S}"
+        target = self.processed_dir / f"{stem}{file_path.suffix}"
+        counter = 1
+        while target.exists():
+            target = self.processed_dir / f"{stem}_{counter}{file_path.suffix}"
+            counter += 1
+        return target
 
 def start_watcher(watch_dir: str, patterns: List[str], ignore_patterns: List[str], 
                   process_callback: Callable[[Path], bool], stabilization_seconds: int = 5,
-                  delete_after_processing: bool = True) -> Observer:
-    """Start watching a directory for Excel files."""
+                  delete_after_processing: bool = True, max_workers: int = 4,
+                  processed_dir: Optional[str] = None,
+                  use_polling: bool = False) -> Tuple[Observer, ExcelFileHandler]:
+    """Start watching a directory for Excel files.
+
+    On Linux files are processed as soon as the writer closes them or they
+    are renamed within watch_dir, and files moved in from another directory
+    after stabilization_seconds; elsewhere once no event has arrived for
+    them for stabilization_seconds. Files are processed on a pool of
+    max_workers threads, so a slow file does not hold up events for the
+    others. Returns the observer and the event handler; once the observer
+    has been stopped and joined, call the handler's shutdown() to let
+    files being processed finish.
+    """
+    if processed_dir is not None:
+        # Relative to the watched directory; the watch is not recursive, so
+        # files moved there raise no further events
+        processed_path = Path(watch_dir) / processed_dir
+        processed_path.mkdir(exist_ok=True)
+    else:
+        processed_path = None
+
+    if use_polling or _is_network_path(str(watch_dir)):
+        scanner = _ScandirStat()
+        # Two polls per quiet period, so a file still being written always
+        # shows a change before its debounce timer runs out
+        observer = PollingObserverVFS(scanner.stat, scanner.listdir,
+                                      polling_interval=max(stabilization_seconds / 2, 0.5))
+    else:
+        observer = Observer()
+    wait_for_close = InotifyObserver is not None and isinstance(observer, InotifyObserver)
     event_handler = ExcelFileHandler(
         patterns, 
         ignore_patterns, 
         stabilization_seconds,
         process_callback,
-        delete_after_processing
+        delete_after_processing,
+        wait_for_close=wait_for_close,
+        executor=ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="lr-file"),
+        processed_dir=processed_path
     )
-    observer = Observer()
-    observer.schedule(event_handler, watch_dir, recursive=False)
+    # With inotify, subscribe to IN_CLOSE_WRITE, IN_CREATE and IN_MOVE only,
+    # so the kernel does not wake the observer for every write while a file
+    # is saved; created events also carry files moved in from elsewhere
+    event_filter = [FileClosedEvent, FileCreatedEvent, FileMovedEvent] if wait_for_close else None
+    observer.schedule(event_handler, watch_dir, recursive=False, event_filter=event_filter)
     observer.start()
-    return observer
+    return observer, event_handler
@@ -1,8 +1,10 @@
 """Database setup script."""
 import os
-import time
 import subprocess
+from hashlib import blake2b
 import psycopg2
+import psycopg2.errors
+from psycopg2.pool import ThreadedConnectionPool
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -13,6 +15,38 @@ load_dotenv()
 PG_BIN = Path(r'D:\Prerequisites\postgreSQL\bin')
 DATA_DIR = Path(os.getcwd()) / 'pgdata'
 
+# Appended to postgresql.conf for local connections
+CUSTOM_SETTINGS = (
+    b"\n# Custom settings\n"
+    b"listen_addresses = 'localhost'\n"
+    b"port = 5432\n"
+)
+
+# Connection parameters for the maintenance database
+ADMIN_CONNECTION = {
+    'host': 'localhost',
+    'port': '5432',
+    'database': 'postgres',
+    'user': 'postgres',
+}
+
+# Created on first use, since the server is usually started by this script
+_POOL = None
+
+def get_pool():
+    """Return the shared pool of maintenance connections, creating it if needed."""
+    global _POOL
+    if _POOL is None or _POOL.closed:
+        _POOL = ThreadedConnectionPool(1, 8, **ADMIN_CONNECTION)
+    return _POOL
+
+def close_pool():
+    """Close every connection held by the shared pool."""
+    global _POOL
+    if _POOL is not None:
+        _POOL.closeall()
+        _POOL = None
+
 def init_db_cluster():
     """Initialize PostgreSQL data directory."""
     if not DATA_DIR.exists():
@@ -21,39 +55,60 @@ def init_db_cluster():
             [PG_BIN / 'initdb', '-D', str(DATA_DIR), '--username=postgres', '--encoding=UTF8'],
             check=True
         )
-        
-        # Update postgresql.conf for local connections
-        conf_file = DATA_DIR / 'postgresql.conf'
-        with open(conf_file, 'a') as f:
-            f.write("\n# Custom settings\n")
-            f.write("listen_addresses = 'localhost'\n")
-            f.write("port = 5432\n")
     else:
         print("PostgreSQL data directory already exists.")
 
+    configure_cluster()
+
+def configure_cluster():
+    """Make sure postgresql.conf has the settings for local connections.
+
+    A hash of the file as last checked is kept in the data directory, so an
+    unchanged file is neither searched nor rewritten on later runs.
+    """
+    conf_file = DATA_DIR / 'postgresql.conf'
+    marker_file = DATA_DIR / '.lr_conf_hash'
+    if not conf_file.is_file():
+        # Left behind by an initdb that did not finish
+        raise RuntimeError(
+            f"{conf_file} is missing, so {DATA_DIR} is not a complete data directory. "
+            f"Remove {DATA_DIR} and run this script again to re-run initdb."
+        )
+    content = conf_file.read_bytes()
+    digest = blake2b(content, digest_size=8).hexdigest()
+    if marker_file.exists() and marker_file.read_text() == digest:
+        return
+
+    # Matched on the heading line, which also finds settings written in text
+    # mode (with CRLF line endings) by earlier versions of this script
+    if b"# Custom settings" not in content:
+        with open(conf_file, 'ab') as f:
+            f.write(CUSTOM_SETTINGS)
+        digest = blake2b(content + CUSTOM_SETTINGS, digest_size=8).hexdigest()
+    marker_file.write_text(digest)
+
 def start_postgres():
     """Start PostgreSQL server."""
-    print("Starting PostgreSQL server...")
-    subprocess.Popen(
-        [PG_BIN / 'pg_ctl', '-D', str(DATA_DIR), '-l', str(DATA_DIR / 'logfile'), 'start']
+    # pg_ctl status exits 0 only when a server is running on DATA_DIR
+    status = subprocess.run(
+        [PG_BIN / 'pg_ctl', 'status', '-D', str(DATA_DIR)],
+        capture_output=True, text=True
     )
+    if status.returncode == 0:
+        print("PostgreSQL server is already running.")
+        return
 
-    # Wait until server is ready
-    for attempt in range(10):
-        try:
-            conn = psycopg2.connect(
-                host='localhost',
-                port='5432',
-                database='postgres',
-                user='postgres'
-            )
-            conn.close()
-            print("PostgreSQL server is running.")
-            return
-        except Exception as e:
-            print(f"Waiting for server (attempt {attempt + 1}/10)...")
-            time.sleep(1)
-    raise RuntimeError("PostgreSQL server did not start.")
+    print("Starting PostgreSQL server...")
+    # -w makes pg_ctl wait until the server accepts connections (up to -t
+    # seconds), so no polling is needed here
+    result = subprocess.run(
+        [PG_BIN / 'pg_ctl', '-D', str(DATA_DIR), '-l', str(DATA_DIR / 'logfile'), '-w', '-t', '10', 'start'],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        output = "\n".join(part.strip() for part in (result.stdout, result.stderr) if part.strip())
+        raise RuntimeError(f"PostgreSQL server did not start:\n{output}")
+    print("PostgreSQL server is running.")
 
 def stop_postgres():
     """Stop PostgreSQL server."""
@@ -65,26 +120,28 @@ def stop_postgres():
 
 def setup_database():
     """Create database and required tables."""
-    # First try to connect to postgres database
-    conn = psycopg2.connect(
-        host='localhost',
-        port='5432',
-        database='postgres',
-        user='postgres'
-    )
+    pool = get_pool()
+    conn = pool.getconn()
     conn.autocommit = True
     try:
         with conn.cursor() as cur:
-            cur.execute("SELECT 1 FROM pg_database WHERE datname = 'lr_generator'")
-            if not cur.fetchone():
+            # CREATE DATABASE cannot run inside a DO block, so create it
+            # directly and treat an existing database as success
+            try:
                 cur.execute("CREATE DATABASE lr_generator")
                 print("Created database: lr_generator")
+            except psycopg2.errors.DuplicateDatabase:
+                pass
     finally:
-        conn.close()
+        conn.autocommit = False
+        pool.putconn(conn)
 
     # Continue with table creation (same as your current logic)
 
 if __name__ == '__main__':
     init_db_cluster()
     start_postgres()
-    setup_database()
+    try:
+        setup_database()
+    finally:
+        close_pool()
@@ -1,44 +1,40 @@
 """Test script to generate a sample PDF with the new format."""
+import sys
 import yaml
 from datetime import date, time
+from itertools import cycle
 from pathlib import Path
 from lr_generator.pdf_generator import PDFGenerator
 
-# Sample data
-sample_records = [
-    {
-        "lr_id": "BLR2505230001",
-        "receive_date": date(2023, 5, 25),
-        "party_name": "ABC Enterprises Pvt Ltd",
-        "location": "Mumbai, Maharashtra",
-        "boxes": 15,
-        "transporter": "Express Logistics",
-        "remark": "Handle with care"
-    },
-    {
-        "lr_id": "BLR2505230002",
-        "receive_date": date(2023, 5, 25),
-        "party_name": "XYZ Industries",
-        "location": "Delhi, NCR",
-        "boxes": 8,
-        "transporter": "Speed Carriers",
-        "remark": "Fragile items"
-    },
-    {
-        "lr_id": "BLR2505230003",
-        "receive_date": date(2023, 5, 25),
-        "party_name": "PQR Trading Co",
-        "location": "Bangalore, Karnataka",
-        "boxes": 12,
-        "transporter": "Safe Transit",
-        "remark": "Urgent delivery"
-    }
+# Sample data: parties, places and transporters cycled through the records
+RECEIVE_DATE = date(2023, 5, 25)
+SAMPLE_PARTIES = [
+    ("ABC Enterprises Pvt Ltd", "Mumbai, Maharashtra", 15, "Express Logistics", "Handle with care"),
+    ("XYZ Industries", "Delhi, NCR", 8, "Speed Carriers", "Fragile items"),
+    ("PQR Trading Co", "Bangalore, Karnataka", 12, "Safe Transit", "Urgent delivery"),
 ]
 
-def main():
+def sample_records(count: int = len(SAMPLE_PARTIES)) -> list:
+    """Build count sample LR records; pass a larger count to load-test PDF generation."""
+    return [
+        {
+            "lr_id": f"BLR250523{i + 1:04d}",
+            "receive_date": RECEIVE_DATE,
+            "party_name": party_name,
+            "location": location,
+            "boxes": boxes,
+            "transporter": transporter,
+            "remark": remark,
+        }
+        for i, (party_name, location, boxes, transporter, remark)
+        in zip(range(count), cycle(SAMPLE_PARTIES))
+    ]
+
+def main(count: int = len(SAMPLE_PARTIES)):
     # Load configuration
     with open('rules.yml', 'r') as f:
-        config = yaml.safe_load(f)['lr_generation']
+        # libyaml's loader when PyYAML was built with it
+        config = yaml.load(f, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))['lr_generation']
     
     # Create output directory if it doesn't exist
     output_dir = Path('output')
@@ -49,8 +45,9 @@ def main():
     
     # Generate sample PDF
     output_path = output_dir / 'sample_lr.pdf'
-    pdf_gen.create_lr_document(sample_records, str(output_path))
+    pdf_gen.create_lr_document(sample_records(count), str(output_path))
     print(f"Generated sample PDF at: {output_path}")
 
 if __name__ == '__main__':
-    main()
+    # Optional record count, e.g. `python test_pdf.py 10000`
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else len(SAMPLE_PARTIES))
@@ -0,0 +1,6 @@
+"""Shared test setup."""
+import sys
+from pathlib import Path
+
+# The package is used from a checkout rather than installed
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
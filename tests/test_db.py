@@ -0,0 +1,68 @@
+"""Tests for the binary COPY encoding of records.
+
+Expected bytes are what PostgreSQL's numeric_send, date_send and
+time_send return for the same values.
+"""
+import struct
+from datetime import date, time
+from decimal import Decimal
+
+import pytest
+
+from lr_generator.db import (
+    RECORD_COLUMNS, _binary_copy_data, _encode_date, _encode_numeric, _encode_time,
+)
+
+
+@pytest.mark.parametrize('value, expected', [
+    (Decimal('0'), '0000000000000000'),
+    (Decimal('-1'), '00010000400000000001'),
+    (Decimal('12.5'), '0002000000000001000c1388'),
+    (Decimal('-0.0001'), '0001ffff400000040001'),
+    (Decimal('0.05'), '0001ffff0000000201f4'),
+    (Decimal('9592.00'), '00010000000000022578'),
+    (Decimal('10000'), '00010001000000000001'),
+    (Decimal('0.000012345'), '0002fffe0000000904d21388'),
+    (Decimal('1e20'), '00010005000000000001'),
+    (Decimal('123456789012345678.1234'), '0006000400000004000c0d801ed204d2162e04d2'),
+    # Floats are encoded through their shortest repr
+    (12.5, '0002000000000001000c1388'),
+    (0.1, '0001ffff0000000103e8'),
+    (1234, '000100000000000004d2'),
+])
+def test_encode_numeric(value, expected):
+    assert _encode_numeric(value).hex() == expected
+
+
+@pytest.mark.parametrize('value', [float('inf'), float('-inf'), Decimal('Infinity'), Decimal('-Infinity')])
+def test_encode_numeric_rejects_infinity(value):
+    with pytest.raises(ValueError):
+        _encode_numeric(value)
+
+
+@pytest.mark.parametrize('value, expected', [
+    (date(2000, 1, 1), '00000000'),
+    (date(1999, 12, 31), 'ffffffff'),
+    (date(2025, 4, 23), '0000241c'),
+])
+def test_encode_date(value, expected):
+    assert _encode_date(value).hex() == expected
+
+
+@pytest.mark.parametrize('value, expected', [
+    (time(0, 0), '0000000000000000'),
+    (time(13, 45, 30, 250000), '0000000b883ba310'),
+    (time(23, 59, 59, 999999), '000000141dd75fff'),
+])
+def test_encode_time(value, expected):
+    assert _encode_time(value).hex() == expected
+
+
+def test_binary_copy_framing():
+    row = tuple('x' if i == 0 else None for i in range(len(RECORD_COLUMNS)))
+    data = _binary_copy_data([row, row]).getvalue()
+
+    header = b'PGCOPY\n\xff\r\n\x00' + struct.pack('>ii', 0, 0)
+    encoded_row = (struct.pack('>h', len(RECORD_COLUMNS)) + struct.pack('>i', 1) + b'x'
+                   + struct.pack('>i', -1) * (len(RECORD_COLUMNS) - 1))
+    assert data == header + encoded_row * 2 + struct.pack('>h', -1)
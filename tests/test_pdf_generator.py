@@ -0,0 +1,63 @@
+"""Tests for LR layout and pagination."""
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+import yaml
+
+from lr_generator.pdf_generator import PDFGenerator
+
+pypdf = pytest.importorskip('pypdf')
+
+RULES = Path(__file__).resolve().parent.parent / 'rules.yml'
+LONG_REMARK = "Deliver to the back gate, call the store manager before unloading. " * 6
+
+
+def _config(workers=1):
+    with open(RULES) as f:
+        config = yaml.safe_load(f)['lr_generation']
+    config['pdf_workers'] = workers
+    return config
+
+
+def _records(count, long_at=()):
+    return [
+        dict(lr_id=f'LR{i:05d}', receive_date='2025-04-23', party_name=f'PARTY {i}',
+             location='BHOPAL', boxes=i % 7, transporter='EXPRESS',
+             remark=LONG_REMARK if i in long_at else 'Handle with care')
+        for i in range(count)
+    ]
+
+
+def _pages(path):
+    return [page.extract_text() for page in pypdf.PdfReader(path).pages]
+
+
+@pytest.mark.parametrize('long_at', [(), (1,), (1, 7, 8, 30)])
+def test_parallel_pages_match_serial(tmp_path, long_at):
+    records = _records(40, long_at)
+    PDFGenerator(_config(1)).create_lr_document(records, str(tmp_path / 'serial.pdf'))
+    PDFGenerator(_config(4)).create_lr_document(records, str(tmp_path / 'parallel.pdf'))
+
+    serial, parallel = _pages(tmp_path / 'serial.pdf'), _pages(tmp_path / 'parallel.pdf')
+    assert len(parallel) == len(serial)
+    assert parallel == serial
+
+
+def test_long_values_are_wrapped_not_cut(tmp_path):
+    generator = PDFGenerator(_config())
+    document = generator.open_document()
+    document.add_records(_records(3, long_at=(1,)))
+    text = ' '.join(pypdf.PdfReader(BytesIO(document.getvalue())).pages[0].extract_text().split())
+
+    assert '...' not in text
+    assert ' '.join(LONG_REMARK.split()) in text
+
+
+def test_tall_lr_moves_to_next_page():
+    generator = PDFGenerator(_config())
+    per_page = len(generator.page_slots)
+    records = _records(per_page, long_at=(per_page - 1,))
+
+    assert generator._page_starts(records) == [0, per_page - 1]
+    assert generator._page_starts(_records(per_page + 1)) == [0, per_page]
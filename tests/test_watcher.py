@@ -0,0 +1,82 @@
+"""Tests for the watcher's per-file bookkeeping."""
+import os
+import time
+
+import pytest
+
+from lr_generator.watcher import ExcelFileHandler, start_watcher
+
+
+def _handler(processed, **kwargs):
+    return ExcelFileHandler(['*.xlsx'], ['~$*'], 1, lambda path: processed.append(path.read_bytes()) or True,
+                            **kwargs)
+
+
+@pytest.mark.parametrize('move', [False, True])
+def test_same_name_dropped_twice_is_processed_twice(tmp_path, move):
+    processed = []
+    processed_dir = tmp_path / '.processed'
+    if move:
+        processed_dir.mkdir()
+    handler = _handler(processed, processed_dir=processed_dir if move else None)
+    path = str(tmp_path / 'a.xlsx')
+    key = os.path.normcase(path)
+
+    for content in (b'first', b'second'):
+        (tmp_path / 'a.xlsx').write_bytes(content)
+        handler._run(key, path)
+
+    assert processed == [b'first', b'second']
+    assert not (tmp_path / 'a.xlsx').exists()
+    if move:
+        assert sorted(p.read_bytes() for p in processed_dir.iterdir()) == [b'first', b'second']
+    handler.shutdown()
+
+
+def test_file_left_in_place_is_processed_once(tmp_path):
+    processed = []
+    handler = _handler(processed, delete_after_processing=False)
+    path = str(tmp_path / 'a.xlsx')
+    (tmp_path / 'a.xlsx').write_bytes(b'data')
+
+    handler._run(os.path.normcase(path), path)
+    handler._run(os.path.normcase(path), path)
+
+    assert processed == [b'data']
+    handler.shutdown()
+
+
+def test_empty_file_is_not_marked_seen(tmp_path):
+    processed = []
+    handler = _handler(processed)
+    path = str(tmp_path / 'a.xlsx')
+    key = os.path.normcase(path)
+
+    (tmp_path / 'a.xlsx').write_bytes(b'')
+    handler._run(key, path)
+    (tmp_path / 'a.xlsx').write_bytes(b'data')
+    handler._run(key, path)
+
+    assert processed == [b'data']
+    handler.shutdown()
+
+
+@pytest.mark.parametrize('use_polling', [False, True])
+def test_watcher_picks_up_same_name_again(tmp_path, use_polling):
+    processed = []
+    observer, handler = start_watcher(
+        str(tmp_path), ['*.xlsx'], ['~$*'], lambda path: processed.append(path.read_bytes()) or True,
+        stabilization_seconds=1, processed_dir='.processed', use_polling=use_polling,
+    )
+    try:
+        for content in (b'first', b'second'):
+            (tmp_path / 'a.xlsx').write_bytes(content)
+            deadline = time.monotonic() + 10
+            while content not in processed and time.monotonic() < deadline:
+                time.sleep(0.1)
+    finally:
+        observer.stop()
+        observer.join()
+        handler.shutdown()
+
+    assert processed == [b'first', b'second']